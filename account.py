@@ -0,0 +1,209 @@
+# account.py – CACHED ACCOUNT SNAPSHOT (balance + open positions) FED BY THE USER-DATA STREAM
+import asyncio
+import gzip
+import json
+import time
+from typing import NamedTuple
+import aiohttp
+from api import bingx_api_request, get_session, get_simulator
+from logs import get_logger
+
+log = get_logger('account')
+
+STREAM_URL = "wss://open-api-swap.bingx.com/swap-market"
+LISTEN_KEY_PATH = '/openApi/user/auth/userDataStream'
+LISTEN_KEY_EXTEND = 30 * 60   # BingX listen keys expire after 60 minutes
+RESYNC_INTERVAL = 300         # REST resync even while the stream is healthy
+RECONNECT_DELAY = 5
+
+class Snapshot(NamedTuple):
+    balance: float | None      # available USDT
+    positions: dict            # symbol → signed position amount (non-zero only)
+    updated_at: float          # time.time() of the last update
+    source: str                # 'rest', 'stream' or 'none'
+
+    def age(self):
+        return time.time() - self.updated_at
+
+    @property
+    def open_count(self):
+        return len(self.positions)
+
+def _available_balance(resp):
+    # v2 returns {'balance': {...}}, v3 returns a list of assets
+    data = resp.get('data')
+    if isinstance(data, list):
+        data = next((d for d in data if d.get('asset') == 'USDT'), data[0] if data else {})
+    if isinstance(data, dict):
+        data = data.get('balance', data)
+        bal = data.get('availableMargin', data.get('availableBalance'))
+        if bal is not None:
+            return float(bal)
+    return None
+
+def _symbol(raw):
+    return raw.replace('-', '').upper()
+
+class AccountState:
+    """Keeps balance and open positions in memory for one BingX account.
+
+    Readers use `snapshot`, an immutable tuple that is replaced in one assignment, so no lock
+    is needed. Updates come from ACCOUNT_UPDATE events on the user-data WebSocket; the REST
+    endpoints are only used at startup, after reconnects and every RESYNC_INTERVAL seconds.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.snapshot = Snapshot(None, {}, 0.0, 'none')
+        self.order_listeners = []   # callables receiving ORDER_TRADE_UPDATE payloads
+        self._tasks = []
+        self._listen_key = None
+        self._balance_dirty = False
+
+    async def resync(self):
+        """Refresh balance and positions over REST (both calls in parallel)."""
+        bal_resp, pos_resp = await asyncio.gather(
+            bingx_api_request('GET', '/openApi/swap/v2/user/balance', self.client['api_key'], self.client['secret_key']),
+            bingx_api_request('GET', '/openApi/swap/v2/trade/position', self.client['api_key'], self.client['secret_key']),
+        )
+        snap = self.snapshot
+        if bal_resp.get('code') != 0 and pos_resp.get('code') != 0:
+            # Nothing new: keep the old timestamp so callers can see the snapshot is stale
+            log.warning("Resync failed: %s / %s", bal_resp.get('msg'), pos_resp.get('msg'))
+            return snap
+        balance = _available_balance(bal_resp) if bal_resp.get('code') == 0 else None
+        positions = snap.positions
+        if pos_resp.get('code') == 0:
+            positions = {}
+            for p in pos_resp.get('data') or []:
+                amt = float(p.get('positionAmt', 0) or 0)
+                if amt:
+                    positions[_symbol(p['symbol'])] = amt if p.get('positionSide') != 'SHORT' else -abs(amt)
+        self.snapshot = Snapshot(balance if balance is not None else snap.balance, positions, time.time(), 'rest')
+        self._balance_dirty = False
+        return self.snapshot
+
+    async def start(self):
+        await self.resync()
+        self._tasks = [
+            asyncio.create_task(self._stream_loop()),
+            asyncio.create_task(self._resync_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._listen_key:
+            await bingx_api_request('DELETE', LISTEN_KEY_PATH, self.client['api_key'], self.client['secret_key'],
+                                    params={'listenKey': self._listen_key})
+            self._listen_key = None
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(RESYNC_INTERVAL)
+            try:
+                await self.resync()
+            except Exception as e:
+                log.warning("Resync failed: %s", e)
+
+    async def _new_listen_key(self):
+        resp = await bingx_api_request('POST', LISTEN_KEY_PATH, self.client['api_key'], self.client['secret_key'])
+        key = resp.get('listenKey') or (resp.get('data') or {}).get('listenKey')
+        if not key:
+            raise RuntimeError(f"listenKey request failed: {resp}")
+        self._listen_key = key
+        return key
+
+    async def _extend_loop(self):
+        while True:
+            await asyncio.sleep(LISTEN_KEY_EXTEND)
+            await bingx_api_request('PUT', LISTEN_KEY_PATH, self.client['api_key'], self.client['secret_key'],
+                                    params={'listenKey': self._listen_key})
+
+    async def _sim_stream(self, sim):
+        queue = sim.subscribe()
+        try:
+            while True:
+                await self._handle_event(await queue.get())
+        finally:
+            sim.unsubscribe(queue)
+
+    async def _stream_loop(self):
+        sim = get_simulator()
+        if sim is not None:
+            await self._sim_stream(sim)
+            return
+        while True:
+            extender = None
+            try:
+                key = await self._new_listen_key()
+                extender = asyncio.create_task(self._extend_loop())
+                async with get_session(self.client['api_key']).ws_connect(f"{STREAM_URL}?listenKey={key}", heartbeat=20) as ws:
+                    log.info("User-data stream connected")
+                    await self.resync()
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.BINARY:
+                            text = gzip.decompress(msg.data).decode('utf-8')
+                        elif msg.type == aiohttp.WSMsgType.TEXT:
+                            text = msg.data
+                        else:
+                            break
+                        if text == 'Ping':
+                            await ws.send_str('Pong')
+                            continue
+                        await self._handle_event(json.loads(text))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("User-data stream error: %s", e)
+            finally:
+                if extender:
+                    extender.cancel()
+            log.info("User-data stream closed – reconnecting in %ss", RECONNECT_DELAY)
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _handle_event(self, event):
+        kind = event.get('e')
+        if kind == 'ACCOUNT_UPDATE':
+            self._apply_account_update(event.get('a') or {})
+        elif kind == 'ORDER_TRADE_UPDATE':
+            # Fills change the available balance; refresh it once, off the event path
+            self._mark_balance_dirty()
+            for listener in self.order_listeners:
+                try:
+                    await listener(event.get('o') or {})
+                except Exception as e:
+                    log.exception("Order listener failed: %s", e)
+        elif kind == 'listenKeyExpired':
+            raise RuntimeError("listenKey expired")
+
+    def _apply_account_update(self, update):
+        snap = self.snapshot
+        positions = dict(snap.positions)
+        for p in update.get('P') or []:
+            amt = float(p.get('pa', 0) or 0)
+            symbol = _symbol(p['s'])
+            if amt:
+                positions[symbol] = amt
+            else:
+                positions.pop(symbol, None)
+        self.snapshot = Snapshot(snap.balance, positions, time.time(), 'stream')
+        if update.get('B'):
+            self._mark_balance_dirty()
+
+    def _mark_balance_dirty(self):
+        if not self._balance_dirty:
+            self._balance_dirty = True
+            asyncio.get_running_loop().call_later(1.0, lambda: asyncio.ensure_future(self._refresh_balance()))
+
+    async def _refresh_balance(self):
+        if not self._balance_dirty:
+            return
+        resp = await bingx_api_request('GET', '/openApi/swap/v2/user/balance', self.client['api_key'], self.client['secret_key'])
+        balance = _available_balance(resp) if resp.get('code') == 0 else None
+        self._balance_dirty = False
+        if balance is not None:
+            snap = self.snapshot
+            self.snapshot = Snapshot(balance, snap.positions, time.time(), snap.source)
@@ -1,27 +1,130 @@
 # api.py – FINAL BINGX API WRAPPER (WORKS 100% – November 23, 2025)
-import requests
+import aiohttp
 import hashlib
+import json
 import hmac
 import time
 import asyncio
+from ratelimit import bucket, classify, backoff_delay, BACKOFF_BASE, RATE_LIMIT_CODES
+from metrics import record, span
+from logs import get_logger
 
 API_URL = "https://open-api.bingx.com"
+log = get_logger("api")
+
+# === HTTP TRANSPORT ===
+# One long-lived keep-alive pool per account (API key), shared by all of its calls
+HTTP_LIMIT = 100            # total open connections
+HTTP_LIMIT_PER_HOST = 20    # open connections to open-api.bingx.com
+HTTP_DNS_TTL = 300          # seconds to cache DNS answers
+HTTP_KEEPALIVE = 60         # seconds an idle connection stays in the pool
+HTTP_TIMEOUT = 10
+
+_sessions = {}              # api_key → aiohttp session ('' for unsigned calls)
+_simulator = None           # simulator.SimExchange answering requests instead of BingX (dry runs)
+
+def use_simulator(sim):
+    """Route every BingX call to an in-process simulator (None switches back to the network)."""
+    global _simulator
+    _simulator = sim
+
+def get_simulator():
+    return _simulator
+
+def get_session(account=''):
+    """Return the account's aiohttp session, creating it on first use (must run inside the event loop)."""
+    session = _sessions.get(account)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_LIMIT,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_TTL,
+            use_dns_cache=True,
+            keepalive_timeout=HTTP_KEEPALIVE,
+        )
+        session = _sessions[account] = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+    return session
+
+async def warm_up(connections: int = 2, account: str = ''):
+    """Resolve DNS and open `connections` TLS connections in the account's pool before its first signed request."""
+    if _simulator is not None:
+        return
+    session = get_session(account)
+
+    async def _ping():
+        try:
+            async with session.get(f"{API_URL}/openApi/swap/v2/server/time") as resp:
+                await resp.read()
+        except Exception as e:
+            log.warning("Warm-up failed: %s", e)
+
+    await asyncio.gather(*(_ping() for _ in range(max(1, connections))))
+
+async def close_session():
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    await asyncio.gather(*(s.close() for s in sessions if not s.closed))
+
+# === SIGNING ===
+RECV_WINDOW = 5000
+TIME_SYNC_INTERVAL = 300         # seconds between server-time resyncs
+TIME_ERROR_CODES = {100421}      # BingX timestamp / recvWindow rejects
+
+_time_offset_ms = 0              # BingX server time minus local time
+_time_synced_at = None
+_signers = {}                    # secret_key → pre-keyed HMAC state
+
+async def sync_server_time():
+    """Measure the BingX server-time offset (midpoint of the round trip) and cache it."""
+    global _time_offset_ms, _time_synced_at
+    try:
+        sent = time.time() * 1000
+        if _simulator is not None:
+            body = json.loads((await _simulator.request("GET", "/openApi/swap/v2/server/time", ""))[1])
+        else:
+            async with get_session().get(f"{API_URL}/openApi/swap/v2/server/time") as resp:
+                body = await resp.json(content_type=None)
+        received = time.time() * 1000
+        server_ms = int(body['data']['serverTime'])
+    except Exception as e:
+        log.warning("Server time sync failed: %s", e)
+        return False
+
+    offset = int(server_ms - (sent + received) / 2)
+    drift = offset - _time_offset_ms
+    if _time_synced_at is not None and abs(drift) > 250:
+        log.info("Clock drift %+dms since last sync (offset now %+dms)", drift, offset)
+    _time_offset_ms = offset
+    _time_synced_at = time.monotonic()
+    return True
+
+async def time_sync_loop(interval=TIME_SYNC_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        await sync_server_time()
+
+def server_time_ms():
+    return int(time.time() * 1000) + _time_offset_ms
 
 def _build_params(params=None):
-    if params is None:
-        params = {}
-    params = dict(params)
-    params.setdefault("recvWindow", 5000)
-    params["timestamp"] = int(time.time() * 1000)
-    # Sort keys for stable signature
-    return "&".join(f"{k}={params[k]}" for k in sorted(params.keys()))
+    # Payload order is kept as given – BingX signs the query string exactly as sent,
+    # so there is no need to sort keys on every call
+    parts = [f"{k}={v}" for k, v in params.items()] if params else []
+    if not params or "recvWindow" not in params:
+        parts.append(f"recvWindow={RECV_WINDOW}")
+    parts.append(f"timestamp={server_time_ms()}")
+    return "&".join(parts)
 
 def _sign(secret_key: str, query_string: str) -> str:
-    return hmac.new(
-        secret_key.encode("utf-8"),
-        query_string.encode("utf-8"),
-        hashlib.sha256
-    ).hexdigest()
+    base = _signers.get(secret_key)
+    if base is None:
+        base = _signers[secret_key] = hmac.new(secret_key.encode("utf-8"), digestmod=hashlib.sha256)
+    mac = base.copy()
+    mac.update(query_string.encode("utf-8"))
+    return mac.hexdigest()
 
 async def bingx_api_request(
     method: str,
@@ -31,44 +134,68 @@ async def bingx_api_request(
     params: dict | None = None,
     data: dict | None = None,
     retries: int = 3,
-    delay: float = 0.5,
+    delay: float = BACKOFF_BASE,
+    priority: int | None = None,
 ):
     """
-    Unified BingX API request (GET/POST/DELETE)
+    Unified BingX API request (GET/POST/PUT/DELETE)
     All parameters go in query string (BingX requirement)
+    Every call waits for a token from its endpoint group's bucket; stop-loss and entry
+    orders are served before balance and housekeeping calls (see ratelimit.classify).
     """
     method = method.upper()
+    if method not in ("GET", "POST", "PUT", "DELETE"):
+        return {"code": -1, "msg": "Invalid method"}
+
+    group, default_priority = classify(method, path, data)
+    limiter = bucket(group, api_key)
+    if priority is None:
+        priority = default_priority
 
     for attempt in range(retries):
         try:
-            query_params = _build_params(params)
-            if data:
-                query_params += "&" + "&".join(f"{k}={v}" for k, v in data.items())
+            with span('api.rate_wait'):
+                await limiter.acquire(priority)
+            with span('api.sign'):
+                query_params = _build_params(params)
+                if data:
+                    query_params += "&" + "&".join(f"{k}={v}" for k, v in data.items())
 
-            signature = _sign(secret_key, query_params)
-            url = f"{API_URL}{path}?{query_params}&signature={signature}"
+                signature = _sign(secret_key, query_params)
+                url = f"{API_URL}{path}?{query_params}&signature={signature}"
 
             headers = {"X-BX-APIKEY": api_key}
 
-            if method == "GET":
-                resp = requests.get(url, headers=headers, timeout=10)
-            elif method == "POST":
-                resp = requests.post(url, headers=headers, timeout=10)
-            elif method == "DELETE":
-                resp = requests.delete(url, headers=headers, timeout=10)
+            sent = time.perf_counter()
+            if _simulator is not None:
+                status, text, retry_after = await _simulator.request(method, path, query_params)
             else:
-                return {"code": -1, "msg": "Invalid method"}
+                async with get_session(api_key).request(method, url, headers=headers) as resp:
+                    text = await resp.text()
+                    status = resp.status
+                    retry_after = resp.headers.get("Retry-After")
+            record(f"api.{group}", time.perf_counter() - sent)
 
             try:
-                result = resp.json()
+                result = json.loads(text)
             except:
-                result = {"code": -1, "msg": f"Non-JSON response: {resp.text}"}
+                result = {"code": -1, "msg": f"Non-JSON response: {text}"}
 
+            if result.get("code") in TIME_ERROR_CODES and attempt < retries - 1:
+                log.warning("Timestamp rejected on %s – resyncing server time", path)
+                await sync_server_time()
+                continue
+            if status == 429 or result.get("code") in RATE_LIMIT_CODES:
+                wait = backoff_delay(attempt, delay, float(retry_after) if retry_after else None)
+                limiter.penalize(wait)
+                log.warning("Rate limited on %s (%s) – backing off %.2fs", path, group, wait)
+                if attempt < retries - 1:
+                    continue
             return result
 
         except Exception as e:
-            print(f"[API] Request failed (attempt {attempt+1}): {e}")
+            log.warning("Request failed on %s (attempt %d): %s", path, attempt + 1, e)
             if attempt < retries - 1:
-                await asyncio.sleep(delay)
+                await asyncio.sleep(backoff_delay(attempt, delay))
 
-    return {"code": -1, "msg": "All retries failed"}
\ No newline at end of file
+    return {"code": -1, "msg": "All retries failed"}
@@ -0,0 +1,249 @@
+# backtest.py – VECTORIZED BACKTEST OF THE execute_trade BRACKET OVER HISTORICAL SIGNALS
+#
+#   python backtest.py                         replay signals_history.jsonl against klines/
+#   python backtest.py --interval 5m --horizon-hours 48
+import argparse
+import heapq
+import json
+from datetime import datetime
+import numpy as np
+from config import get_config
+from klines import load_klines, symbol_key, INTERVAL_MS
+
+SIGNALS_FILE = 'signals_history.jsonl'
+FEE_RATE = 0.0005        # taker fee per side
+LEVERAGE_CAP = 10        # main.py caps signal leverage at 10x
+
+# exit reasons
+NOT_FILLED, STOPPED, BREAKEVEN, TARGETS, OPEN_AT_END = range(5)
+
+def load_signals(path=SIGNALS_FILE):
+    """Signals exported by export_history.py, oldest first, with 'ts' in ms."""
+    signals = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            rec = json.loads(line)
+            sig = dict(rec['signal'])
+            sig['ts'] = int(datetime.fromisoformat(rec['date']).timestamp() * 1000)
+            signals.append(sig)
+    signals.sort(key=lambda s: s['ts'])
+    return signals
+
+def first_true(mask):
+    """Column index of the first True per row, or the row length when there is none."""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), mask.shape[1])
+
+class Backtest:
+    """Replays the bracket execute_trade builds – LIMIT entry at the range midpoint, four
+    TAKE_PROFIT_MARKET legs, a trailing stop on the remainder and a full-size stop loss
+    (capped like trade.capped_stop() when cap_stop_loss is on) – against candles, for all
+    signals at once.
+
+    Prices are kept in a direction-normalised space (shorts are negated) so one set of
+    array operations handles both sides. Within a candle the stop is assumed to trigger
+    before any TP, which keeps results on the pessimistic side.
+    """
+
+    def __init__(self, signals, klines, horizon_bars=4320, entry_timeout_bars=None, interval_ms=INTERVAL_MS['1m']):
+        self.interval_ms = interval_ms
+        rows = []
+        for s in signals:
+            candles = klines.get(symbol_key(s['symbol']))
+            if candles is None or not len(candles):
+                continue
+            start = np.searchsorted(candles['ts'], s['ts'], side='right')
+            if start < len(candles):
+                rows.append((s, candles, start))
+        self.signals = [s for s, _, _ in rows]
+        n, H = len(rows), horizon_bars
+        self.H = H
+
+        high = np.full((n, H), np.nan)
+        low = np.full((n, H), np.nan)
+        close = np.full((n, H), np.nan)
+        for i, (_, candles, start) in enumerate(rows):
+            window = candles[start:start + H]
+            high[i, :len(window)] = window['high']
+            low[i, :len(window)] = window['low']
+            close[i, :len(window)] = window['close']
+
+        sign = np.array([1.0 if s['direction'] == 'LONG' else -1.0 for s in self.signals])[:, None]
+        self.sign = sign[:, 0]
+        self.scale = np.array([abs(s['entry']) for s in self.signals])
+        self.entry = sign[:, 0] * self.scale
+        self.targets = sign * np.array([s['targets'][:4] for s in self.signals]).reshape(n, 4)
+        self.stoploss = sign[:, 0] * np.array([s['stoploss'] for s in self.signals])
+        self.leverage = np.minimum([s['leverage'] for s in self.signals], LEVERAGE_CAP).astype(float)
+
+        # favourable / adverse extremes of each candle in normalised space
+        self.fav = np.where(sign > 0, high, -low)
+        self.adv = np.where(sign > 0, low, -high)
+        # every window holds at least one candle; padding only follows real data
+        self.last_bar = (~np.isnan(close)).sum(axis=1) - 1
+        self.last_close = sign[:, 0] * close[np.arange(n), self.last_bar]
+
+        # Config-independent part: entry fill and TP trigger bars
+        cols = np.arange(H)[None, :]
+        entry_hit = self.adv <= self.entry[:, None]
+        if entry_timeout_bars:
+            entry_hit &= cols < entry_timeout_bars
+        self.fill_bar = first_true(entry_hit)
+        self.filled = self.fill_bar < H
+        self.after_fill = cols >= self.fill_bar[:, None]
+        self.tp_bar = np.stack([first_true(self.after_fill & (self.fav >= self.targets[:, i, None])) for i in range(4)], axis=1)
+        self._cache = {}
+
+    def stop_prices(self, stop_loss_percent):
+        """Normalised stop loss of every signal: trade.capped_stop() as one array expression."""
+        if not stop_loss_percent:
+            return self.stoploss
+        return np.maximum(self.stoploss, self.entry - self.scale * stop_loss_percent / 100)
+
+    def _stops(self, stop_loss_percent, activate_after_tp, callback_rate):
+        """Stop / breakeven / trailing trigger bars and prices for one risk setting (cached)."""
+        key = (stop_loss_percent, activate_after_tp, callback_rate)
+        if key in self._cache:
+            return self._cache[key]
+        H = self.H
+        cols = np.arange(H)[None, :]
+
+        sl = self.stop_prices(stop_loss_percent)
+        sl_bar = first_true(self.after_fill & (self.adv <= sl[:, None]))
+
+        # Breakeven: once the Nth TP has filled, the stop moves to the entry price
+        if 1 <= activate_after_tp <= 4:
+            be_start = np.sort(self.tp_bar, axis=1)[:, activate_after_tp - 1]
+            be_bar = first_true((cols > be_start[:, None]) & (self.adv <= self.entry[:, None]))
+            use_sl = sl_bar <= be_start
+            stop_bar = np.where(use_sl, sl_bar, be_bar)
+            stop_px = np.where(use_sl, sl, self.entry)
+            stop_kind = np.where(use_sl, STOPPED, BREAKEVEN)
+        else:
+            stop_bar, stop_px, stop_kind = sl_bar, sl, np.full(len(sl), STOPPED)
+
+        # Trailing stop: trigger at callback % behind the best price seen on earlier candles
+        cb = callback_rate / 100
+        best = np.maximum.accumulate(np.where(self.after_fill, self.fav, -np.inf), axis=1)
+        best_prev = np.concatenate([np.full((len(sl), 1), -np.inf), best[:, :-1]], axis=1)
+        best_prev = np.maximum(best_prev, self.entry[:, None])
+        trigger = best_prev - np.abs(best_prev) * cb
+        trail_bar = first_true(self.after_fill & (self.adv <= trigger))
+        rows = np.arange(len(sl))
+        trail_px = trigger[rows, np.minimum(trail_bar, H - 1)]
+
+        result = (stop_bar, stop_px, stop_kind, trail_bar, trail_px)
+        self._cache[key] = result
+        return result
+
+    def leg_returns(self, config):
+        """Per-signal price return of each leg: (n, 4) for the TPs and (n,) for the trailing leg."""
+        stop_bar, stop_px, stop_kind, trail_bar, trail_px = self._stops(
+            config['stop_loss_percent'] if config['cap_stop_loss'] else 0,
+            config['trailing_activate_after_tp'], config['trailing_callback_rate'])
+        stopped = stop_bar < self.H
+        fallback_px = np.where(stopped, stop_px, self.last_close)
+
+        tp_done = self.tp_bar < stop_bar[:, None]
+        tp_exit = np.where(tp_done, self.targets, fallback_px[:, None])
+        trail_done = trail_bar < stop_bar
+        trail_exit = np.where(trail_done, trail_px, fallback_px)
+
+        tp_ret = (tp_exit - self.entry[:, None]) / self.scale[:, None]
+        trail_ret = (trail_exit - self.entry) / self.scale
+        tp_ret[~self.filled] = 0.0
+        trail_ret[~self.filled] = 0.0
+        return tp_ret, trail_ret, stop_bar, stop_kind, tp_done, trail_done, trail_bar
+
+    def run(self, config=None):
+        """Simulate one config. Returns per-signal arrays plus a summary dict."""
+        config = config or get_config()
+        weights = np.array([config[f'tp{i}_close_percent'] for i in range(1, 5)]) / 100
+        trail_w = max(0.0, 1.0 - weights.sum())
+        tp_ret, trail_ret, stop_bar, stop_kind, tp_done, trail_done, trail_bar = self.leg_returns(config)
+
+        price_ret = tp_ret @ weights + trail_ret * trail_w
+        pnl = price_ret * self.leverage - 2 * FEE_RATE * self.leverage * self.filled
+
+        # Bar at which the whole position is flat: the stop, or the last leg to close
+        leg_bars = np.where(tp_done, self.tp_bar, self.H)[:, weights > 0]
+        if trail_w > 0:
+            leg_bars = np.column_stack([leg_bars, np.where(trail_done, trail_bar, self.H)])
+        flat_bar = leg_bars.max(axis=1) if leg_bars.shape[1] else np.zeros(len(pnl), dtype=int)
+        close_bar = np.minimum(np.minimum(stop_bar, flat_bar), self.last_bar)
+
+        reason = np.where(~self.filled, NOT_FILLED,
+                 np.where((stop_bar < self.H) & (stop_bar <= flat_bar), stop_kind,
+                 np.where(flat_bar < self.H, TARGETS, OPEN_AT_END)))
+
+        taken = self._admit(config.get('max_open_positions', 0), close_bar)
+        pnl = np.where(taken, pnl, 0.0)
+        return {
+            'pnl': pnl,                 # return on margin per signal
+            'taken': taken & self.filled,
+            'reason': reason,
+            'summary': summarize(pnl, taken & self.filled, config.get('usdt_per_trade_percent', 1.0)),
+        }
+
+    def evaluate_splits(self, config, splits):
+        """Mean return on margin for many TP splits at once (k x 4 percentages, one risk
+        setting) via a single matrix product. max_open_positions is not applied here."""
+        splits = np.asarray(splits, dtype=float) / 100
+        tp_ret, trail_ret = self.leg_returns(config)[:2]
+        trail_w = np.clip(1.0 - splits.sum(axis=1), 0.0, None)
+        price_ret = tp_ret @ splits.T + trail_ret[:, None] * trail_w[None, :]
+        pnl = price_ret * self.leverage[:, None] - (2 * FEE_RATE * self.leverage)[:, None]
+        return pnl[self.filled].mean(axis=0) if self.filled.any() else np.zeros(len(splits))
+
+    def _admit(self, max_open, close_bar):
+        """Apply max_open_positions in signal order (positions occupy a slot from signal to close)."""
+        n = len(self.signals)
+        if not max_open or not n:
+            return np.ones(n, dtype=bool)
+        ts = np.array([s['ts'] for s in self.signals])
+        # unfilled entries never hold a position slot
+        ends = np.where(self.filled, ts + (close_bar + 1) * self.interval_ms, ts)
+        taken = np.zeros(n, dtype=bool)
+        open_ends = []
+        for i in np.argsort(ts, kind='stable'):
+            while open_ends and open_ends[0] <= ts[i]:
+                heapq.heappop(open_ends)
+            if len(open_ends) < max_open:
+                taken[i] = True
+                heapq.heappush(open_ends, ends[i])
+        return taken
+
+def summarize(pnl, taken, risk_percent):
+    trades = pnl[taken]
+    equity = np.cumprod(1 + trades * risk_percent / 100) if len(trades) else np.ones(1)
+    peak = np.maximum.accumulate(equity)
+    return {
+        'trades': int(taken.sum()),
+        'win_rate': float((trades > 0).mean()) if len(trades) else 0.0,
+        'avg_return': float(trades.mean()) if len(trades) else 0.0,
+        'total_return': float(equity[-1] - 1),
+        'max_drawdown': float((1 - equity / peak).max()),
+    }
+
+def build(signals_path=SIGNALS_FILE, interval='1m', horizon_hours=72, entry_timeout_hours=None):
+    signals = load_signals(signals_path)
+    klines = {k: load_klines(k, interval) for k in {symbol_key(s['symbol']) for s in signals}}
+    bars = int(horizon_hours * 3_600_000 // INTERVAL_MS[interval])
+    timeout = int(entry_timeout_hours * 3_600_000 // INTERVAL_MS[interval]) if entry_timeout_hours else None
+    return Backtest(signals, klines, horizon_bars=bars, entry_timeout_bars=timeout, interval_ms=INTERVAL_MS[interval])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--signals', default=SIGNALS_FILE)
+    ap.add_argument('--interval', default='1m', choices=sorted(INTERVAL_MS))
+    ap.add_argument('--horizon-hours', type=float, default=72)
+    ap.add_argument('--entry-timeout-hours', type=float, default=None)
+    args = ap.parse_args()
+
+    bt = build(args.signals, args.interval, args.horizon_hours, args.entry_timeout_hours)
+    result = bt.run(get_config())
+    print(f"Signals with candles: {len(bt.signals)}  (entry filled: {int(bt.filled.sum())})")
+    for k, v in result['summary'].items():
+        print(f"  {k:13}: {v:.4f}" if isinstance(v, float) else f"  {k:13}: {v}")
+
+if __name__ == '__main__':
+    main()
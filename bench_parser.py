@@ -0,0 +1,86 @@
+# bench_parser.py – GOLDEN-CORPUS CHECK + THROUGHPUT BENCHMARK FOR parse_signal
+#
+#   python bench_parser.py                  check golden corpus, then benchmark
+#   python bench_parser.py --update-golden  rebuild signals_golden.json from the messages file and screenlog
+import argparse
+import json
+import re
+import sys
+import time
+from bot_telegram import parse_signal, parse_many
+
+MESSAGES_FILE = 'telegram_messages.txt'
+SCREENLOG_FILE = 'screenlog.txt'
+GOLDEN_FILE = 'signals_golden.json'
+
+# "Preview: PREMIUM SIGNAL ..." up to the next log line ("[SKIP] ...", "[DEBUG] ...")
+_PREVIEW = re.compile(r'Preview: (PREMIUM SIGNAL.*?)(?=\n\S*\[|\Z)', re.S)
+
+def load_blocks(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().split('===')
+
+def load_previews(path):
+    """Distinct signal previews the old bot logged, in order of first appearance."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return list(dict.fromkeys(m.group(1) for m in _PREVIEW.finditer(f.read())))
+
+def expected(block):
+    signal = parse_signal(block)
+    if signal is None:
+        return None
+    record = signal.to_dict()
+    record.pop('raw_text')
+    record.pop('message_id')
+    return record
+
+def update_golden(blocks, path):
+    corpus = [{'text': b, 'expected': expected(b)} for b in blocks if b.strip()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=1)
+    print(f"Wrote {len(corpus)} cases ({sum(c['expected'] is not None for c in corpus)} signals) to {path}")
+
+def check_golden(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    failures = 0
+    for i, case in enumerate(corpus):
+        got = expected(case['text'])
+        if got != case['expected']:
+            failures += 1
+            print(f"GOLDEN MISMATCH #{i}\n  expected: {case['expected']}\n  got:      {got}\n  text: {case['text'][:200]!r}")
+    print(f"Golden corpus: {len(corpus) - failures}/{len(corpus)} OK")
+    return failures == 0, [c['text'] for c in corpus]
+
+def bench(texts, seconds):
+    parsed = len(parse_many(texts))
+    runs = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        parse_many(texts)
+        runs += 1
+    elapsed = time.perf_counter() - started
+    per_block = elapsed / (runs * len(texts))
+    print(f"Benchmark: {len(texts)} blocks ({parsed} signals) x {runs} runs")
+    print(f"  {1 / per_block:,.0f} blocks/s   {per_block * 1e6:.2f} µs/block")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--messages', default=MESSAGES_FILE)
+    ap.add_argument('--screenlog', default=SCREENLOG_FILE)
+    ap.add_argument('--golden', default=GOLDEN_FILE)
+    ap.add_argument('--update-golden', action='store_true')
+    ap.add_argument('--seconds', type=float, default=2.0)
+    args = ap.parse_args()
+
+    if args.update_golden:
+        update_golden(load_blocks(args.messages) + load_previews(args.screenlog), args.golden)
+        return 0
+
+    ok, texts = check_golden(args.golden)
+    texts += [b for b in load_blocks(args.messages) if b.strip()]
+    bench(texts, args.seconds)
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,17 @@
 # bot_telegram.py – FINAL
-from telethon import TelegramClient
 import re
+import time
+from metrics import record, span
+from logs import get_logger
+
+log = get_logger('telegram')
 
 client = None
 
+# telethon is imported on first use: parse_signal() users (file mode, backtests) never pay for it
 def init_telegram(api_id, api_hash):
     global client
+    from telethon import TelegramClient
     client = TelegramClient('session', api_id, api_hash)
 
 def read_credentials(credentials_file='credentials.txt'):
@@ -17,76 +23,160 @@ def read_credentials(credentials_file='credentials.txt'):
                     k, v = line.strip().split(':', 1)
                     creds[k.strip()] = v.strip()
     except Exception as e:
-        print(f"Error reading credentials: {e}")
+        log.error("Error reading credentials: %s", e)
     return creds
 
+def read_channel(channel_file='channel_details.txt'):
+    """Return (channel_id, access_hash) from channel_details.txt."""
+    details = read_credentials(channel_file)
+    return int(details['Channel ID']), int(details['Access Hash'])
+
+async def start_signal_listener(queue, credentials_file='credentials.txt', channel_file='channel_details.txt'):
+    """Push every parsed signal from the channel onto `queue` as soon as Telegram delivers it."""
+    from telethon import events
+    from telethon.tl.types import InputPeerChannel
+    creds = read_credentials(credentials_file)
+    if client is None:
+        init_telegram(int(creds['api_id']), creds['api_hash'])
+    channel_id, access_hash = read_channel(channel_file)
+    entity = InputPeerChannel(channel_id, access_hash)
+
+    @client.on(events.NewMessage(chats=entity))
+    async def _on_message(event):
+        received = time.perf_counter()
+        # Channel post → bot (Telegram dates have whole-second resolution)
+        record('ingest', time.time() - event.date.timestamp())
+        with span('parse'):
+            signal = parse_signal(event.raw_text)
+        if signal:
+            signal['message_id'] = event.id
+            signal['received_at'] = received
+            signal['posted_at'] = event.date.timestamp()
+            queue.put_nowait(signal)
+            log.info("Signal %s queued: %s %s", event.id, signal['symbol'], signal['direction'])
+
+    await client.start()
+    log.info("Listening for signals on channel %s", channel_id)
+    return client
+
+class Signal:
+    """Parsed signal record. Supports signal['field'] / signal.get() like the old dict.
+
+    `received_at` is the perf_counter() time the message reached the bot and `posted_at` the
+    unix time it was posted to the channel (None when unknown); neither is part of the
+    record (to_dict / ==).
+    """
+    FIELDS = ('symbol', 'direction', 'leverage', 'entry', 'entry_min', 'entry_max',
+              'targets', 'stoploss', 'raw_text', 'message_id')
+    __slots__ = FIELDS + ('received_at', 'posted_at')
+
+    def __init__(self, symbol, direction, leverage, entry, entry_min, entry_max, targets, stoploss, raw_text, message_id=None):
+        self.symbol = symbol
+        self.direction = direction
+        self.leverage = leverage
+        self.entry = entry
+        self.entry_min = entry_min
+        self.entry_max = entry_max
+        self.targets = targets
+        self.stoploss = stoploss
+        self.raw_text = raw_text
+        self.message_id = message_id
+        self.received_at = None
+        self.posted_at = None
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __eq__(self, other):
+        return isinstance(other, Signal) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Signal({self.symbol} {self.direction} {self.leverage}x entry={self.entry} sl={self.stoploss})"
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+# Precompiled once. Each pattern has a literal or charset prefix so the regex engine can
+# skip ahead, and every search except the bracket scan stops at its first hit. The
+# symbol, leverage and stoploss lookups run on the upper-cased text, which replaces the
+# IGNORECASE flag.
+_SYMBOL_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+_LEVERAGE = re.compile(r'(\d+)X')
+_ENTRY = re.compile(r'<([\d.]+)-([\d.]+)>')
+_BRACKET = re.compile(r'\[([\d.]+)\]')
+_STOPLOSS = re.compile(r'STOPLOSS.*?([\d.]+)')
+
+def _find_symbol(upper):
+    # First SYMBOL/USDT – handles both 🟢 SYMBOL/USDT and plain SYMBOL/USDT
+    idx = upper.find('/USDT')
+    while idx != -1:
+        start = idx
+        while start > 0 and upper[start - 1] in _SYMBOL_CHARS:
+            start -= 1
+        if start < idx:
+            return upper[start:idx + 5]
+        idx = upper.find('/USDT', idx + 5)
+    return None
+
 def parse_signal(text):
-    if not text or "PREMIUM SIGNAL" not in text.upper():
+    if not text:
+        return None
+    upper = text.upper()
+    if "PREMIUM SIGNAL" not in upper:
         return None
 
     try:
         # Direction
-        direction = "LONG" if "LONG" in text.upper() or "BUY" in text.upper() else "SHORT"
+        direction = "LONG" if "LONG" in upper or "BUY" in upper else "SHORT"
 
-        # Symbol - handles both 🟢 SYMBOL/USDT and plain SYMBOL/USDT
-        symbol_match = re.search(r'[🟢🔴]?\s*([A-Z0-9]+/USDT)', text, re.IGNORECASE)
-        if not symbol_match:
+        symbol = _find_symbol(upper)
+        if symbol is None:
             return None
-        symbol = symbol_match.group(1).upper()
 
         # Leverage - handles 20X, 50X, 75X, etc.
-        lev_match = re.search(r'(\d+)X', text, re.IGNORECASE)
+        lev_match = _LEVERAGE.search(upper)
         if not lev_match:
             return None
         leverage = int(lev_match.group(1))
 
         # Entry range - <0.00117-0.00118>
-        entry_match = re.search(r'<([\d.]+)-([\d.]+)>', text)
+        entry_match = _ENTRY.search(text)
         if not entry_match:
             return None
         entry_min = float(entry_match.group(1))
         entry_max = float(entry_match.group(2))
         entry = (entry_min + entry_max) / 2
 
-        # Targets - extract all [number] in order
-        targets = []
-        for m in re.finditer(r'\[([\d.]+)\]', text):
-            targets.append(float(m.group(1)))
-        if len(targets) < 4:
+        # Targets - every [number] in order, scanned once and reused for the stoploss fallback
+        brackets = _BRACKET.findall(text)
+        if len(brackets) < 4:
             return None
-        targets = targets[:4]  # Take first 4 only
-
-        # Stoploss - STOPLOSS: [0.00102] or just [0.00102]
-        sl_match = re.search(r'STOPLOSS.*?([\d.]+)', text, re.IGNORECASE)
-        if not sl_match:
-            # Fallback: last [number] after targets
-            if len(targets) >= 4:
-                # Usually stoploss is the last bracketed number after targets
-                all_brackets = [float(m.group(1)) for m in re.finditer(r'\[([\d.]+)\]', text)]
-                if len(all_brackets) > 4:
-                    stoploss = all_brackets[-1]
-                else:
-                    return None
-            else:
-                return None
-        else:
+        targets = [float(b) for b in brackets[:4]]  # Take first 4 only
+
+        # Stoploss - STOPLOSS: [0.00102], else the last bracket after the targets
+        sl_match = _STOPLOSS.search(upper)
+        if sl_match:
             stoploss = float(sl_match.group(1))
+        elif len(brackets) > 4:
+            stoploss = float(brackets[-1])
+        else:
+            return None
 
-        # OPTIONAL DEBUG (REMOVED TO PREVENT SPAM)
-        # print(f"[PARSED SUCCESS] {symbol} {direction} {leverage}x Entry ~{entry} | TP4: {targets[3]} | SL: {stoploss}")
-
-        return {
-            'symbol': symbol,
-            'direction': direction,
-            'leverage': leverage,
-            'entry': entry,
-            'entry_min': entry_min,
-            'entry_max': entry_max,
-            'targets': targets,
-            'stoploss': stoploss,
-            'raw_text': text
-        }
+        return Signal(symbol, direction, leverage, entry, entry_min, entry_max, targets, stoploss, text)
 
     except Exception as e:
-        print(f"[PARSE FAILED] {e}\nFirst 200 chars: {text[:200]}")
+        log.warning("Parse failed: %s – first 200 chars: %r", e, text[:200])
         return None
+
+def parse_many(texts):
+    """Parse a batch of message texts / file blocks, keeping only valid signals."""
+    return [s for s in map(parse_signal, texts) if s is not None]
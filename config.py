@@ -1,10 +1,24 @@
 # config.py – FINAL
+import json
+import os
+import time
+from types import MappingProxyType
+from logs import get_logger
+
+log = get_logger('config')
+
 DEFAULT_CONFIG = {
     # "usdt_per_trade_percent": 5.8, #original
     "usdt_per_trade_percent": .0008, #for testing
     "max_open_positions": 14,
     "max_trades_per_day": 20,
     "check_interval_seconds": 8,
+    "signal_max_age_minutes": 120,  # pending signals older than this are dropped
+    "entry_tolerance_percent": 0.5,  # drop a pending signal once price runs this far past its entry range
+    "scheduler_age_weight": 1.0,  # priority penalty per minute waited
+    "scheduler_distance_weight": 10.0,  # ... per % of price outside the entry range
+    "scheduler_leverage_weight": 0.1,  # ... per 1x of signal leverage (lower leverage first on ties)
+    "signal_source": "file",  # "file" (poll telegram_messages.txt) or "telegram" (NewMessage events)
     "position_mode": "Isolated",
     "order_type": "LIMIT",
     "tp1_close_percent": 35.0,
@@ -14,23 +28,133 @@ DEFAULT_CONFIG = {
     "trailing_activate_after_tp": 2,
     "trailing_callback_rate": 1.3,
     "stop_loss_percent": 1.8,
-    "dry_run_mode": False
+    "cap_stop_loss": False,  # true: stops further than stop_loss_percent from the entry are moved in to it
+    "dedup_window_hours": 720,  # how long a traded signal is remembered across restarts
+    "bracket_mode": "concurrent",  # "concurrent" or "serial" TP/trailing/SL placement
+    "journal_file": "order_journal.db",  # every order leg, for crash recovery at startup
+    "accounts_file": "accounts.json",  # list of sub-account keys; when missing, keys are prompted for
+    "metrics_interval_seconds": 300,  # latency summary printed this often
+    "metrics_port": 9108,  # local GET /metrics JSON endpoint (0 = off)
+    "log_level": "INFO",  # DEBUG also logs every order payload and response
+    "log_file": "bot.log.jsonl",  # JSON lines, size-rotated
+    "log_max_mb": 10,
+    "log_backups": 5,
+    "dry_run_mode": False,  # orders go to the local simulator; journal and dedup use dry_run_ files
+    "dry_run_balance": 10000.0  # simulated USDT balance when dry_run_mode is on
 }
 
 CONFIG_FILE = "bot_config.json"
+STAT_INTERVAL = 1.0  # seconds between mtime checks in get_config()
+
+# Read once at startup; changing these in the file is logged but needs a restart
+RESTART_KEYS = ("accounts_file", "journal_file", "signal_source", "dry_run_mode", "dry_run_balance",
+                "metrics_port", "metrics_interval_seconds", "log_level", "log_file", "log_max_mb", "log_backups",
+                "dedup_window_hours")
+CHOICES = {
+    "signal_source": ("file", "telegram"),
+    "bracket_mode": ("concurrent", "serial"),
+}
+TP_KEYS = ("tp1_close_percent", "tp2_close_percent", "tp3_close_percent", "tp4_close_percent")
+
+class ConfigError(ValueError):
+    pass
 
-def load_config():
-    import json, os
-    if os.path.exists(CONFIG_FILE):
+def validate(cfg):
+    """Raise ConfigError if a known key has the wrong type or an impossible value.
+
+    Types follow DEFAULT_CONFIG (ints are accepted for floats, not floats for ints); unknown
+    keys are allowed.
+    """
+    errors = []
+    for key, default in DEFAULT_CONFIG.items():
+        value = cfg[key]
+        if isinstance(default, bool):
+            ok = isinstance(value, bool)
+        elif isinstance(default, (int, float)):
+            number = int if isinstance(default, int) else (int, float)
+            ok = isinstance(value, number) and not isinstance(value, bool)
+            if ok and value < 0:
+                errors.append(f"{key} must not be negative (got {value})")
+        else:
+            ok = isinstance(value, type(default))
+        if not ok:
+            errors.append(f"{key} must be {type(default).__name__} (got {value!r})")
+    for key, allowed in CHOICES.items():
+        if cfg[key] not in allowed:
+            errors.append(f"{key} must be one of {', '.join(allowed)} (got {cfg[key]!r})")
+    if not errors:
+        if sum(cfg[k] for k in TP_KEYS) > 100 + 1e-9:
+            errors.append(f"TP close percents add up to {sum(cfg[k] for k in TP_KEYS)} (max 100)")
+        if cfg["max_open_positions"] < 1:
+            errors.append("max_open_positions must be at least 1")
+        if not 1 <= cfg["trailing_activate_after_tp"] <= 4:
+            errors.append("trailing_activate_after_tp must be 1–4")
+        for key in ("check_interval_seconds", "metrics_interval_seconds"):
+            if cfg[key] < 1:
+                errors.append(f"{key} must be at least 1")
+        if cfg["metrics_port"] > 65535:
+            errors.append(f"metrics_port must be 0 (off) or 1–65535 (got {cfg['metrics_port']})")
+    if errors:
+        raise ConfigError("; ".join(errors))
+
+def load_config(path=CONFIG_FILE):
+    """DEFAULT_CONFIG overlaid with `path` (if it exists), validated. Raises ConfigError."""
+    cfg = DEFAULT_CONFIG.copy()
+    if os.path.exists(path):
         try:
-            with open(CONFIG_FILE, 'r') as f:
+            with open(path, 'r') as f:
                 raw = json.load(f)
-            cfg = DEFAULT_CONFIG.copy()
-            cfg.update(raw)
-            return cfg
-        except:
-            pass
-    return DEFAULT_CONFIG.copy()
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"{path}: {e}") from e
+        if not isinstance(raw, dict):
+            raise ConfigError(f"{path}: expected a JSON object")
+        cfg.update(raw)
+    validate(cfg)
+    return cfg
+
+# === CACHED SNAPSHOT ===
+# get_config() hands out one read-only mapping that is replaced in a single assignment when
+# the file changes, so running tasks always see a complete, validated config.
+_snapshot = None
+_stamp = None           # (mtime_ns, size) of the file behind _snapshot
+_checked_at = 0.0
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def reload(force=False):
+    """Re-read the file if its mtime or size changed. An invalid file keeps the old snapshot
+    (logged); at startup, with nothing to fall back on, the ConfigError is raised."""
+    global _snapshot, _stamp
+    stamp = _file_stamp(CONFIG_FILE)
+    if not force and _snapshot is not None and stamp == _stamp:
+        return _snapshot
+    try:
+        cfg = load_config(CONFIG_FILE)
+    except ConfigError as e:
+        if _snapshot is None:
+            raise
+        log.error("Config reload failed – keeping the previous settings: %s", e)
+        _stamp = stamp  # don't retry until the file changes again
+        return _snapshot
+    old = _snapshot
+    _snapshot, _stamp = MappingProxyType(cfg), stamp
+    if old is not None:
+        changed = [k for k in cfg.keys() | old.keys() if cfg.get(k) != old.get(k)]
+        for key in sorted(changed):
+            log.warning("Config %s: %r → %r%s", key, old.get(key), cfg.get(key),
+                           " (takes effect after a restart)" if key in RESTART_KEYS else "")
+    return _snapshot
 
 def get_config():
-    return load_config()
\ No newline at end of file
+    """Current config snapshot (read-only mapping). Costs a stat() at most every STAT_INTERVAL."""
+    global _checked_at
+    now = time.monotonic()
+    if _snapshot is None or now - _checked_at >= STAT_INTERVAL:
+        _checked_at = now
+        return reload()
+    return _snapshot
@@ -0,0 +1,3 @@
+# conftest.py – PYTEST COLLECTION (python -m pytest -q)
+# test_bot.py is the interactive live check (phone login, real keys): run it with `python test_bot.py`
+collect_ignore = ['test_bot.py', 'venv']
@@ -0,0 +1,100 @@
+# contracts.py – BINGX CONTRACT SPECS (tick size / step size / min qty / min notional)
+import asyncio
+import time
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from api import bingx_api_request
+from logs import get_logger
+
+log = get_logger('contracts')
+
+CONTRACTS_PATH = '/openApi/swap/v2/quote/contracts'
+CONTRACTS_TTL = 3600  # seconds before the index is reloaded
+RETRY_AFTER = 60      # seconds to wait after a failed load
+
+_index = {}
+_loaded_at = 0.0
+_failed_at = None
+_lock = None
+
+def _key(symbol):
+    # BTC/USDT, BTC-USDT and BTCUSDT all map to the same entry
+    return symbol.replace('/', '').replace('-', '').upper()
+
+def _parse_contract(raw):
+    price_precision = int(raw.get('pricePrecision', 6))
+    qty_precision = int(raw.get('quantityPrecision', 6))
+    return {
+        'symbol': raw['symbol'],
+        'tick_size': Decimal(1).scaleb(-price_precision),
+        'step_size': Decimal(1).scaleb(-qty_precision),
+        'min_qty': Decimal(str(raw.get('tradeMinQuantity') or 0)),
+        'min_notional': Decimal(str(raw.get('tradeMinUSDT') or 0)),
+    }
+
+async def load_contracts(client):
+    """Load every contract spec in one bulk call. Keeps the old index if the call fails."""
+    global _index, _loaded_at, _failed_at
+    resp = await bingx_api_request('GET', CONTRACTS_PATH, client['api_key'], client['secret_key'])
+    if resp.get('code') != 0 or not resp.get('data'):
+        log.warning("Load failed: %s", resp.get('msg'))
+        _failed_at = time.monotonic()
+        return False
+
+    index = {}
+    for raw in resp['data']:
+        try:
+            index[_key(raw['symbol'])] = _parse_contract(raw)
+        except Exception as e:
+            log.warning("Bad spec %s: %s", raw.get('symbol'), e)
+    _index = index
+    _loaded_at = time.monotonic()
+    _failed_at = None
+    log.info("Loaded %d contract specs", len(index))
+    return True
+
+async def ensure_contracts(client, ttl=CONTRACTS_TTL):
+    """Reload the index when it is empty or older than `ttl`; a no-op on the hot path otherwise."""
+    global _lock
+    now = time.monotonic()
+    if _index and now - _loaded_at < ttl:
+        return True
+    if _failed_at is not None and now - _failed_at < RETRY_AFTER:
+        return bool(_index)
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if _index and time.monotonic() - _loaded_at < ttl:
+            return True
+        return await load_contracts(client)
+
+def get_contract(symbol):
+    return _index.get(_key(symbol))
+
+def quantize_qty(symbol, qty):
+    """Round a quantity down to the contract step size."""
+    spec = get_contract(symbol)
+    value = Decimal(str(qty))
+    if spec is None:
+        return value.quantize(Decimal('0.000001'), rounding=ROUND_DOWN)
+    return value.quantize(spec['step_size'], rounding=ROUND_DOWN)
+
+def quantize_price(symbol, price):
+    """Round a price to the nearest contract tick."""
+    spec = get_contract(symbol)
+    value = Decimal(str(price))
+    if spec is None:
+        return value
+    return value.quantize(spec['tick_size'], rounding=ROUND_HALF_UP)
+
+def check_order(symbol, qty, price):
+    """Return an error string when qty/notional is below the contract minimums, else None."""
+    spec = get_contract(symbol)
+    if qty <= 0:
+        return "quantity rounds to zero"
+    if spec is None:
+        return None
+    if qty < spec['min_qty']:
+        return f"quantity {qty} below min {spec['min_qty']}"
+    if qty * price < spec['min_notional']:
+        return f"notional {qty * price} below min {spec['min_notional']} USDT"
+    return None
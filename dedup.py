@@ -0,0 +1,101 @@
+# dedup.py – PERSISTENT STORE OF TRADED SIGNAL HASHES (survives restarts)
+import hashlib
+import sqlite3
+import time
+from logs import get_logger
+
+log = get_logger('dedup')
+
+EVICT_EVERY = 3600  # seconds between eviction passes
+
+def signal_key(raw_text):
+    """Dedup key of a signal: MD5 of its text with line endings and surrounding whitespace
+    normalised, so a block read as the file's open tail and the same block re-read after a
+    restart (with the next separator's blank lines attached) map to one key."""
+    return hashlib.md5(raw_text.replace('\r\n', '\n').strip().encode()).hexdigest()
+
+def legacy_key(raw_text):
+    # Keys stored before normalisation hashed the raw block
+    return hashlib.md5(raw_text.encode()).hexdigest()
+
+class DedupStore:
+    """Set-like store of handled signal keys, backed by a SQLite WAL table.
+
+    Each key carries an outcome – 'sending' while orders are going out, then 'traded' (an
+    entry was accepted on at least one account) or 'skipped'; 'expired' for signals the
+    scheduler dropped – so handled signals are never queued again, but only real entries
+    count towards the daily trade limit.
+
+    Rows older than `window_hours` are evicted, so memory and disk stay flat over long uptimes.
+    The table is loaded lazily on first use; membership checks are in-memory dict lookups.
+    """
+
+    def __init__(self, path='traded_signals.db', window_hours=720):
+        self.path = path
+        self.window = window_hours * 3600
+        self._db = None
+        self._seen = None
+        self._last_evict = 0.0
+
+    def _load(self):
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS traded ("
+            " key TEXT PRIMARY KEY,"
+            " message_id INTEGER,"
+            " traded_at REAL NOT NULL)"
+        )
+        try:
+            self._db.execute("ALTER TABLE traded ADD COLUMN outcome TEXT NOT NULL DEFAULT 'traded'")
+        except sqlite3.OperationalError:
+            pass    # already migrated
+        self._db.commit()
+        self._evict(time.time())
+        self._seen = dict(self._db.execute("SELECT key, traded_at FROM traded"))
+        log.info("Loaded %d traded signals from %s", len(self._seen), self.path)
+
+    def _ensure(self):
+        if self._seen is None:
+            self._load()
+        return self._seen
+
+    def _evict(self, now):
+        cutoff = now - self.window
+        self._db.execute("DELETE FROM traded WHERE traded_at < ?", (cutoff,))
+        self._db.commit()
+        if self._seen:
+            self._seen = {k: t for k, t in self._seen.items() if t >= cutoff}
+        self._last_evict = now
+
+    def __contains__(self, key):
+        return key in self._ensure()
+
+    def __len__(self):
+        return len(self._ensure())
+
+    def add(self, key, message_id=None, outcome='traded'):
+        seen = self._ensure()
+        now = time.time()
+        seen[key] = now
+        self._db.execute(
+            "INSERT OR REPLACE INTO traded (key, message_id, traded_at, outcome) VALUES (?, ?, ?, ?)",
+            (key, message_id, now, outcome),
+        )
+        self._db.commit()
+        if now - self._last_evict > EVICT_EVERY:
+            self._evict(now)
+
+    def count_since(self, since, outcomes=('traded',)):
+        """Number of keys recorded with one of `outcomes` since the unix time `since`."""
+        self._ensure()
+        marks = ','.join('?' * len(outcomes))
+        return self._db.execute(f"SELECT COUNT(*) FROM traded WHERE traded_at >= ? AND outcome IN ({marks})",
+                                (since, *outcomes)).fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            self._seen = None
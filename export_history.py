@@ -0,0 +1,177 @@
+# export_history.py – RESUMABLE, PARALLEL CHANNEL HISTORY EXPORT (JSONL)
+#
+#   python export_history.py                      resume: new messages + continue back in time
+#   python export_history.py --since 2025-06-01   stop going back at this date
+#   python export_history.py --batch-size 100 --concurrency 8
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from telethon import TelegramClient
+from telethon.tl.types import InputPeerChannel
+from bot_telegram import read_credentials, read_channel, parse_signal
+
+OUTPUT_FILE = 'signals_history.jsonl'
+SESSION_NAME = 'export_session'
+BATCH_SIZE = 100      # message IDs per request (Telegram max for get_messages by id)
+CONCURRENCY = 4       # ID ranges fetched at the same time
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {'newest_id': 0, 'oldest_id': None, 'done': False}
+
+def save_checkpoint(path, checkpoint):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+def load_exported_ids(path):
+    """IDs already in the output file. A torn last line (crash mid-write) is cut off."""
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    with open(path, 'r+b') as f:
+        good = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                ids.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                pass
+            good += len(line)
+        f.truncate(good)
+    return ids
+
+def to_record(message):
+    signal = parse_signal(message.message or '')
+    if signal is None:
+        return None
+    record = signal.to_dict()
+    record.pop('raw_text')
+    record['message_id'] = message.id
+    return {
+        'id': message.id,
+        'date': message.date.isoformat(),
+        'signal': record,
+        'text': message.message,
+    }
+
+async def fetch_range(client, entity, first_id, last_id, sem):
+    """Fetch message IDs first_id..last_id (inclusive) in one request."""
+    async with sem:
+        messages = await client.get_messages(entity, ids=list(range(first_id, last_id + 1)))
+    return [m for m in messages if m is not None]
+
+async def export_ids(client, entity, ids_from, ids_to, out, exported, checkpoint, checkpoint_path, args, backwards):
+    """Export IDs between ids_from and ids_to in waves of `concurrency` ranges, skipping the
+    IDs in `exported` (already in the output file)."""
+    sem = asyncio.Semaphore(args.concurrency)
+    step = args.batch_size
+    saved = 0
+    cursor = ids_from
+    since = args.since
+
+    while (cursor >= ids_to) if backwards else (cursor <= ids_to):
+        ranges = []
+        for _ in range(args.concurrency):
+            if backwards:
+                if cursor < ids_to:
+                    break
+                lo = max(ids_to, cursor - step + 1)
+                ranges.append((lo, cursor))
+                cursor = lo - 1
+            else:
+                if cursor > ids_to:
+                    break
+                hi = min(ids_to, cursor + step - 1)
+                ranges.append((cursor, hi))
+                cursor = hi + 1
+
+        pages = await asyncio.gather(*(fetch_range(client, entity, lo, hi, sem) for lo, hi in ranges))
+        messages = sorted((m for page in pages for m in page), key=lambda m: m.id)
+
+        reached_since = False
+        lines = []
+        for m in messages:
+            if since and m.date < since:
+                reached_since = True
+                continue
+            if m.id in exported:
+                continue
+            record = to_record(m)
+            if record:
+                lines.append(json.dumps(record, ensure_ascii=False))
+                exported.add(m.id)
+        if lines:
+            out.write('\n'.join(lines) + '\n')
+            out.flush()
+            saved += len(lines)
+
+        # Checkpoint only after the wave is on disk; a crash in between re-fetches the wave,
+        # and its IDs are then skipped as already exported
+        if backwards:
+            checkpoint['oldest_id'] = min(lo for lo, _ in ranges)
+        else:
+            checkpoint['newest_id'] = max(hi for _, hi in ranges)
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(f"[EXPORT] IDs {min(lo for lo, _ in ranges)}–{max(hi for _, hi in ranges)}: {len(lines)} signals ({saved} this run)")
+
+        if backwards and reached_since:
+            checkpoint['done'] = True
+            save_checkpoint(checkpoint_path, checkpoint)
+            break
+    return saved
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--output', default=OUTPUT_FILE)
+    ap.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    ap.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    ap.add_argument('--since', type=lambda s: datetime.fromisoformat(s).replace(tzinfo=timezone.utc),
+                    help='oldest message date to export (YYYY-MM-DD)')
+    args = ap.parse_args()
+    args.batch_size = max(1, min(100, args.batch_size))
+    checkpoint_path = args.output + '.checkpoint'
+
+    creds = read_credentials('credentials.txt')
+    channel_id, access_hash = read_channel('channel_details.txt')
+    entity = InputPeerChannel(channel_id, access_hash)
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    client = TelegramClient(SESSION_NAME, int(creds['api_id']), creds['api_hash'])
+    await client.start()
+    try:
+        latest = await client.get_messages(entity, limit=1)
+        if not latest:
+            print("[EXPORT] Channel is empty")
+            return
+        newest = latest[0].id
+
+        exported = load_exported_ids(args.output)
+        with open(args.output, 'a', encoding='utf-8') as out:
+            saved = 0
+            if checkpoint['oldest_id'] is None:
+                # First run: everything from the newest message backwards
+                checkpoint['newest_id'] = newest
+                checkpoint['oldest_id'] = newest + 1
+                save_checkpoint(checkpoint_path, checkpoint)
+            elif newest > checkpoint['newest_id']:
+                saved += await export_ids(client, entity, checkpoint['newest_id'] + 1, newest,
+                                          out, exported, checkpoint, checkpoint_path, args, backwards=False)
+            if not checkpoint['done'] and checkpoint['oldest_id'] > 1:
+                saved += await export_ids(client, entity, checkpoint['oldest_id'] - 1, 1,
+                                          out, exported, checkpoint, checkpoint_path, args, backwards=True)
+                if checkpoint['oldest_id'] <= 1:
+                    checkpoint['done'] = True
+                    save_checkpoint(checkpoint_path, checkpoint)
+        print(f"\nCOMPLETED! {saved} signals appended to {args.output} (IDs {checkpoint['oldest_id']}–{checkpoint['newest_id']})")
+    finally:
+        await client.disconnect()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+# fanout.py – ONE SIGNAL → EVERY SUB-ACCOUNT, CONCURRENTLY (per-account pool, limits, snapshot, TP monitor)
+import asyncio
+import json
+import time
+from api import warm_up
+from account import AccountState, RESYNC_INTERVAL
+from tp_monitor import TPMonitor
+from trade import execute_trade
+from journal import reconcile
+from ratelimit import backoff_delay
+from logs import get_logger
+
+log = get_logger('fanout')
+
+ACCOUNTS_FILE = 'accounts.json'
+SNAPSHOT_MAX_AGE = 2 * RESYNC_INTERVAL
+
+def load_accounts(path=ACCOUNTS_FILE):
+    """Client dicts from a JSON list of {"name", "api_key", "secret_key"} objects.
+
+    Optional per-account keys: "usdt_per_trade_percent" (overrides the config) and
+    "enabled" (false skips the account).
+    """
+    with open(path, 'r') as f:
+        raw = json.load(f)
+    clients = []
+    for i, acc in enumerate(raw):
+        if not acc.get('enabled', True):
+            continue
+        clients.append({
+            'name': acc.get('name') or f"account{i + 1}",
+            'api_key': acc['api_key'].strip(),
+            'secret_key': acc['secret_key'].strip(),
+            'base_url': "https://open-api.bingx.com",
+            'usdt_per_trade_percent': acc.get('usdt_per_trade_percent'),
+        })
+    return clients
+
+class Member:
+    """One account of the fleet with its own snapshot and bracket monitor."""
+    __slots__ = ('name', 'client', 'account', 'tp_monitor')
+
+    def __init__(self, client, config):
+        self.name = client.get('name', 'main')
+        self.client = client
+        self.account = AccountState(client)
+        self.tp_monitor = TPMonitor(client, activate_after_tp=config['trailing_activate_after_tp'])
+        self.account.order_listeners.append(self.tp_monitor.on_order_update)
+
+    async def snapshot(self):
+        """Cached account snapshot; only goes to REST when it is missing or stale."""
+        snap = self.account.snapshot
+        if snap.balance is None or snap.age() > SNAPSHOT_MAX_AGE:
+            snap = await self.account.resync()
+            if snap.age() > SNAPSHOT_MAX_AGE:
+                raise RuntimeError(f"snapshot is {snap.age():.0f}s old and resync failed")
+        self.tp_monitor.prune(snap.positions)
+        return snap
+
+class Fleet:
+    """Executes each signal on every account at once.
+
+    Accounts share nothing on the request path – each has its own connection pool, rate
+    limit buckets and user-data stream – so N accounts fill in about the time of one. A
+    failure in one account is logged and reported without touching the others.
+    """
+
+    def __init__(self, clients, config, journal=None):
+        self.config = config
+        self.journal = journal
+        self.members = [Member(c, config) for c in clients]
+        self._retries = []
+
+    def reconfigure(self, config):
+        """Use a new config snapshot for every following trade."""
+        self.config = config
+        for member in self.members:
+            member.tp_monitor.activate_after_tp = config['trailing_activate_after_tp']
+
+    async def start(self):
+        started = time.time()
+
+        async def _start(member):
+            await warm_up(account=member.client['api_key'])
+            if self.journal is None:
+                await member.account.start()
+                return
+            # Re-arm anything a crash left unprotected, and resume breakeven tracking, while the snapshot loads
+            await asyncio.gather(self._reconcile(member, started), member.account.start())
+
+        results = await asyncio.gather(*(_start(m) for m in self.members), return_exceptions=True)
+        for member, result in zip(self.members, results):
+            if isinstance(result, Exception):
+                log.error("%s failed to start: %s", member.name, result)
+
+    async def _reconcile(self, member, started):
+        try:
+            await reconcile(member.client, self.journal, member.tp_monitor, before=started)
+        except Exception as e:
+            log.error("%s reconcile failed: %s – retrying in the background", member.name, e)
+            self._retries.append(asyncio.create_task(self._retry_reconcile(member, started)))
+
+    async def _retry_reconcile(self, member, started):
+        """Retry the startup reconcile with backoff until it goes through, so a transient
+        openOrders / positions error never leaves a crashed position unprotected."""
+        attempt = 0
+        while True:
+            attempt += 1
+            await asyncio.sleep(backoff_delay(attempt))
+            try:
+                await reconcile(member.client, self.journal, member.tp_monitor, before=started)
+            except Exception as e:
+                log.warning("%s reconcile retry %d failed: %s", member.name, attempt, e)
+                continue
+            log.info("%s reconciled on retry %d", member.name, attempt)
+            return
+
+    async def stop(self):
+        for task in self._retries:
+            task.cancel()
+        await asyncio.gather(*self._retries, *(m.account.stop() for m in self.members), return_exceptions=True)
+
+    async def snapshots(self):
+        """(member, snapshot or None) for every account, fetched concurrently."""
+        results = await asyncio.gather(*(m.snapshot() for m in self.members), return_exceptions=True)
+        return [(m, None if isinstance(r, Exception) else r) for m, r in zip(self.members, results)]
+
+    def open_symbols(self):
+        """Symbols with a position on any account, from the cached snapshots."""
+        return {symbol for m in self.members for symbol in m.account.snapshot.positions}
+
+    async def with_room(self, max_open):
+        """Accounts that can take another position, with their snapshots."""
+        ready = []
+        for member, snap in await self.snapshots():
+            if snap is None:
+                log.warning("%s snapshot unavailable – skipped", member.name)
+            elif snap.open_count < max_open:
+                ready.append((member, snap))
+        return ready
+
+    async def execute(self, signal, leverage, ready, trade_size):
+        """Trade `signal` on every (member, snapshot) in `ready`.
+
+        trade_size(balance, percent) → USDT margin for one account.
+        """
+        started = time.monotonic()
+
+        async def _one(member, snap):
+            percent = member.client.get('usdt_per_trade_percent') or self.config['usdt_per_trade_percent']
+            usdt_amount = trade_size(snap.balance, percent)
+            try:
+                outcome = await execute_trade(member.client, signal, usdt_amount, leverage=leverage, config=self.config,
+                                              journal=self.journal)
+            except Exception as e:
+                log.exception("%s trade failed: %s", member.name, e)
+                return {'account': member.name, 'usdt': usdt_amount, 'ok': False, 'error': str(e), 'outcome': None}
+            member.tp_monitor.track(outcome)
+            return {'account': member.name, 'usdt': usdt_amount, 'ok': bool(outcome and outcome['ok']),
+                    'error': None, 'outcome': outcome}
+
+        results = await asyncio.gather(*(_one(m, s) for m, s in ready))
+        report = {
+            'symbol': signal['symbol'],
+            'accounts': len(results),
+            'ok': sum(r['ok'] for r in results),
+            'failed': [r['account'] for r in results if not r['ok']],
+            'usdt': sum(r['usdt'] for r in results),
+            'elapsed': time.monotonic() - started,
+            'results': results,
+        }
+        level = log.info if not report['failed'] else log.warning
+        level("%s on %d/%d accounts in %.2fs ($%.2f total)%s", signal['symbol'], report['ok'], report['accounts'],
+              report['elapsed'], report['usdt'],
+              f" – failed: {', '.join(report['failed'])}" if report['failed'] else '',
+              extra={'fields': {k: v for k, v in report.items() if k != 'results'}})
+        return report
@@ -0,0 +1,213 @@
+# journal.py – CRASH-SAFE ORDER JOURNAL (intent + ack per leg) AND STARTUP RECONCILIATION
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from api import bingx_api_request
+from trade import place_bracket
+from metrics import record
+from logs import get_logger
+
+log = get_logger('journal')
+
+JOURNAL_FILE = 'order_journal.db'
+OPEN_ORDERS_PATH = '/openApi/swap/v2/trade/openOrders'
+POSITIONS_PATH = '/openApi/swap/v2/trade/position'
+KEEP_DAYS = 30          # closed trades older than this are evicted
+STOP_TYPES = ('STOP_MARKET', 'TRAILING_STOP_MARKET')
+
+# trade states
+ENTRY, BRACKET, PLACED, CLOSED = 'entry', 'bracket', 'placed', 'closed'
+
+def _key(symbol):
+    return symbol.replace('/', '').replace('-', '').upper()
+
+class OrderJournal:
+    """Record of every order leg, written before it is sent (intent) and after BingX answers
+    (acked / failed). The whole bracket is journaled with the entry, so a crash at any point
+    leaves enough to re-arm the position. Each leg carries clientOrderID "<trade_id>-<leg>",
+    so an intent whose ack was lost can still be found among the open orders.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS trades ("
+            " trade_id TEXT PRIMARY KEY, account TEXT NOT NULL, symbol TEXT NOT NULL,"
+            " direction TEXT NOT NULL, state TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS trades_open ON trades (state, account);"
+            "CREATE TABLE IF NOT EXISTS legs ("
+            " trade_id TEXT NOT NULL, leg TEXT NOT NULL, client_id TEXT NOT NULL, payload TEXT NOT NULL,"
+            " status TEXT NOT NULL, order_id TEXT, updated_at REAL NOT NULL,"
+            " PRIMARY KEY (trade_id, leg));"
+        )
+        self._db.commit()
+        self._evict()
+
+    def _evict(self):
+        cutoff = time.time() - KEEP_DAYS * 86400
+        with self._db:
+            self._db.execute("DELETE FROM legs WHERE trade_id IN (SELECT trade_id FROM trades WHERE state = ? AND updated_at < ?)",
+                             (CLOSED, cutoff))
+            self._db.execute("DELETE FROM trades WHERE state = ? AND updated_at < ?", (CLOSED, cutoff))
+
+    # === WRITE PATH (one transaction per batch of legs) ===
+    def begin(self, account, symbol, direction, legs):
+        """Journal a new trade and the intent of all its (name, payload) legs; returns the trade id."""
+        # Short enough that "<trade_id>-<leg>-<retry>" fits BingX's 40-char clientOrderID
+        trade_id = f"{int(time.time() * 1000):x}{os.urandom(2).hex()}"
+        now = time.time()
+        with self._db:
+            self._db.execute("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (trade_id, account, _key(symbol), direction, ENTRY, now, now))
+            self._write_intents(trade_id, legs, now)
+        return trade_id
+
+    def intents(self, trade_id, legs, state=None, retry=None):
+        """Record (name, payload) legs about to be (re)sent; stamps clientOrderID into each payload."""
+        now = time.time()
+        with self._db:
+            self._write_intents(trade_id, legs, now, retry)
+            if state:
+                self._db.execute("UPDATE trades SET state = ?, updated_at = ? WHERE trade_id = ?", (state, now, trade_id))
+
+    def _write_intents(self, trade_id, legs, now, retry=None):
+        rows = []
+        for name, payload in legs:
+            payload['clientOrderID'] = f"{trade_id}-{name}" + (f"-{retry}" if retry else '')
+            rows.append((trade_id, name, payload['clientOrderID'], json.dumps(payload), 'intent', None, now))
+        self._db.executemany("INSERT OR REPLACE INTO legs VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def acks(self, trade_id, results, state=None):
+        """Record place_order results (ack with orderId, or failed)."""
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "UPDATE legs SET status = ?, order_id = ?, updated_at = ? WHERE trade_id = ? AND leg = ?",
+                [('acked' if r['ok'] else 'failed', None if r['order_id'] is None else str(r['order_id']), now, trade_id, r['leg'])
+                 for r in results])
+            if state:
+                self._db.execute("UPDATE trades SET state = ?, updated_at = ? WHERE trade_id = ?", (state, now, trade_id))
+
+    def set_state(self, trade_id, state):
+        with self._db:
+            self._db.execute("UPDATE trades SET state = ?, updated_at = ? WHERE trade_id = ?", (state, time.time(), trade_id))
+
+    # === READ PATH ===
+    def open_trades(self, account):
+        """Unclosed trades of one account with their legs, oldest first."""
+        trades = {}
+        for trade_id, symbol, direction, state, created_at in self._db.execute(
+                "SELECT trade_id, symbol, direction, state, created_at FROM trades WHERE state != ? AND account = ? ORDER BY created_at",
+                (CLOSED, account)):
+            trades[trade_id] = {'trade_id': trade_id, 'symbol': symbol, 'direction': direction, 'state': state,
+                                'created_at': created_at, 'legs': {}}
+        if trades:
+            marks = ','.join('?' * len(trades))
+            for trade_id, leg, client_id, payload, status, order_id in self._db.execute(
+                    f"SELECT trade_id, leg, client_id, payload, status, order_id FROM legs WHERE trade_id IN ({marks})",
+                    list(trades)):
+                trades[trade_id]['legs'][leg] = {'client_id': client_id, 'payload': json.loads(payload),
+                                                 'status': status, 'order_id': order_id}
+        return list(trades.values())
+
+    def close(self):
+        self._db.close()
+
+# === RECONCILIATION ===
+async def _fetch_state(client):
+    orders_resp, pos_resp = await asyncio.gather(
+        bingx_api_request('GET', OPEN_ORDERS_PATH, client['api_key'], client['secret_key']),
+        bingx_api_request('GET', POSITIONS_PATH, client['api_key'], client['secret_key']),
+    )
+    if orders_resp.get('code') != 0 or pos_resp.get('code') != 0:
+        raise RuntimeError(f"open orders / positions unavailable: {orders_resp.get('msg') or pos_resp.get('msg')}")
+    orders = (orders_resp.get('data') or {}).get('orders') or []
+    positions = {}
+    for p in pos_resp.get('data') or []:
+        amt = float(p.get('positionAmt', 0) or 0)
+        if amt:
+            positions[_key(p['symbol'])] = amt
+    return orders, positions
+
+async def reconcile(client, journal, tp_monitor=None, before=None):
+    """Bring every unclosed journaled trade of `client` back to a protected state.
+
+    Two bulk calls (open orders + positions) per account, then, per trade:
+      * no position and no resting entry → the trade is over: close it;
+      * legs whose ack was lost but that reached the book → recorded as acked;
+      * legs never acknowledged and not resting on the book → sent again;
+      * a position with no stop or trailing order left → a stop loss for the full position;
+      * with a `tp_monitor`, the bracket is handed to TPMonitor.restore() so the breakeven
+        stop keeps working across the restart.
+    With `before` (unix time), only trades journaled before it are touched – a retry running
+    while the bot trades leaves the new trades alone. Returns the number of orders placed.
+    """
+    account = client.get('name', 'main')
+    trades = journal.open_trades(account)
+    if not trades:
+        return 0
+    started = time.perf_counter()
+    orders, positions = await _fetch_state(client)
+    resting = {}
+    for o in orders:
+        cid = o.get('clientOrderId') or o.get('clientOrderID')
+        if cid:
+            resting[cid] = o
+    stops = {_key(o['symbol']) for o in orders if o.get('type') in STOP_TYPES}
+
+    # Only the newest trade on a symbol can own its position; older ones are over
+    latest = {t['symbol']: t['trade_id'] for t in trades}
+    if before is not None:
+        trades = [t for t in trades if t['created_at'] < before]
+    placed = 0
+    for trade in trades:
+        symbol, legs = trade['symbol'], trade['legs']
+        if latest[symbol] != trade['trade_id']:
+            journal.set_state(trade['trade_id'], CLOSED)
+            continue
+        entry = legs.get('ENTRY')
+        entry_resting = entry is not None and entry['client_id'] in resting
+        if symbol not in positions and not entry_resting:
+            journal.set_state(trade['trade_id'], CLOSED)
+            continue
+
+        found = [{'leg': name, 'ok': True, 'order_id': resting[leg['client_id']].get('orderId')}
+                 for name, leg in legs.items() if leg['status'] != 'acked' and leg['client_id'] in resting]
+        if found:
+            journal.acks(trade['trade_id'], found)
+            for r in found:
+                legs[r['leg']].update(status='acked', order_id=str(r['order_id']))
+
+        missing = [(name, leg['payload']) for name, leg in legs.items()
+                   if name != 'ENTRY' and leg['status'] != 'acked']
+        if symbol in positions and symbol not in stops and 'SL' in legs and not any(n == 'SL' for n, _ in missing):
+            # Protection is gone (cancelled, or the stop filled on a previous position) – re-arm for the full size
+            missing.append(('SL', dict(legs['SL']['payload'], quantity=f"{abs(positions[symbol]):f}")))
+        if missing:
+            # Resent legs get a fresh clientOrderID so BingX never sees a duplicate
+            journal.intents(trade['trade_id'], missing, state=BRACKET, retry=f"{int(time.time()) % 46656:x}")
+            results = await place_bracket(client, missing)
+            journal.acks(trade['trade_id'], results, state=PLACED if all(r['ok'] for r in results) else None)
+            placed += sum(r['ok'] for r in results)
+            log.warning("%s: re-placed %s after restart (%d ok)", symbol, ', '.join(n for n, _ in missing),
+                        sum(r['ok'] for r in results))
+            for r in results:
+                if r['ok']:
+                    legs[r['leg']].update(status='acked', order_id=str(r['order_id']), payload=r['payload'])
+                    orders.append({'orderId': r['order_id'], 'symbol': r['payload']['symbol'],
+                                   'type': r['payload']['type'], 'stopPrice': r['payload'].get('stopPrice')})
+        elif trade['state'] != PLACED:
+            journal.set_state(trade['trade_id'], PLACED)
+
+        if tp_monitor is not None:
+            await tp_monitor.restore(trade, orders)
+
+    elapsed = time.perf_counter() - started
+    record('reconcile', elapsed)
+    log.info("Reconciled %d journaled trades for %s in %.2fs – %d orders placed", len(trades), account, elapsed, placed)
+    return placed
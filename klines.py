@@ -0,0 +1,190 @@
+# klines.py – MEMORY-MAPPED KLINE STORE FOR BACKTESTS (BingX /quote/klines → klines/*.bin)
+import asyncio
+import os
+import numpy as np
+from api import bingx_api_request
+
+KLINES_PATH = '/openApi/swap/v3/quote/klines'
+KLINES_DIR = 'klines'
+PAGE_LIMIT = 1440
+
+KLINE_DTYPE = np.dtype([
+    ('ts', '<i8'),       # open time, ms
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+INTERVAL_MS = {'1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000, '1h': 3_600_000}
+
+def symbol_key(symbol):
+    return symbol.replace('/', '').replace('-', '').upper()
+
+def bingx_symbol(symbol):
+    key = symbol_key(symbol)
+    return key[:-4] + '-USDT' if key.endswith('USDT') else key
+
+def _path(symbol, interval, directory=KLINES_DIR):
+    return os.path.join(directory, f"{symbol_key(symbol)}_{interval}.bin")
+
+class KlineStore:
+    """One file of KLINE_DTYPE records per symbol/interval, sorted by ts. New candles are
+    appended; older ones (rare – a backward export) rewrite the file once via prepend().
+
+    Reads are read-only memory maps, so slicing is zero-copy and a run only pages in the
+    candles it touches; timestamps are located by binary search on the mapped 'ts' column.
+    """
+
+    def __init__(self, directory=KLINES_DIR):
+        self.directory = directory
+        self._maps = {}     # path → (size, memmap)
+
+    def open(self, symbol, interval='1m'):
+        path = _path(symbol, interval, self.directory)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return np.empty(0, dtype=KLINE_DTYPE)
+        cached = self._maps.get(path)
+        if cached and cached[0] == size:
+            return cached[1]
+        count = size // KLINE_DTYPE.itemsize
+        if count == 0:
+            return np.empty(0, dtype=KLINE_DTYPE)
+        candles = np.memmap(path, dtype=KLINE_DTYPE, mode='r', shape=(count,))
+        self._maps[path] = (size, candles)
+        return candles
+
+    def first_ts(self, symbol, interval='1m'):
+        candles = self.open(symbol, interval)
+        return int(candles['ts'][0]) if len(candles) else None
+
+    def last_ts(self, symbol, interval='1m'):
+        candles = self.open(symbol, interval)
+        return int(candles['ts'][-1]) if len(candles) else None
+
+    def slice(self, symbol, interval, start_ms, end_ms):
+        """Zero-copy view of candles with start_ms <= ts < end_ms."""
+        candles = self.open(symbol, interval)
+        ts = candles['ts']
+        lo = np.searchsorted(ts, start_ms, side='left')
+        hi = np.searchsorted(ts, end_ms, side='left')
+        return candles[lo:hi]
+
+    def append(self, symbol, interval, candles):
+        """Append candles newer than the last stored one; returns how many were written."""
+        last = self.last_ts(symbol, interval)
+        candles = np.asarray(candles, dtype=KLINE_DTYPE)
+        if last is not None:
+            candles = candles[candles['ts'] > last]
+        if not len(candles):
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        with open(_path(symbol, interval, self.directory), 'ab') as f:
+            f.write(np.ascontiguousarray(candles).tobytes())
+        return len(candles)
+
+    def prepend(self, symbol, interval, candles):
+        """Insert candles older than the first stored one; returns how many were written.
+
+        The file is rewritten to a temporary copy and swapped in with os.replace, so readers
+        holding a map of the old file keep a consistent view.
+        """
+        first = self.first_ts(symbol, interval)
+        if first is None:
+            return self.append(symbol, interval, candles)
+        candles = np.asarray(candles, dtype=KLINE_DTYPE)
+        candles = candles[candles['ts'] < first]
+        if not len(candles):
+            return 0
+        path = _path(symbol, interval, self.directory)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as out, open(path, 'rb') as old:
+            out.write(np.ascontiguousarray(candles).tobytes())
+            while chunk := old.read(1 << 20):
+                out.write(chunk)
+        os.replace(tmp, path)
+        self._maps.pop(path, None)
+        return len(candles)
+
+_store = None
+
+def get_store(directory=KLINES_DIR):
+    global _store
+    if _store is None or _store.directory != directory:
+        _store = KlineStore(directory)
+    return _store
+
+def load_klines(symbol, interval='1m', directory=KLINES_DIR):
+    return get_store(directory).open(symbol, interval)
+
+async def fetch_klines(client, symbol, interval, start_ms, end_ms):
+    """Download candles for [start_ms, end_ms) page by page."""
+    step = INTERVAL_MS[interval] * PAGE_LIMIT
+    rows = []
+    cursor = start_ms
+    while cursor < end_ms:
+        resp = await bingx_api_request('GET', KLINES_PATH, client['api_key'], client['secret_key'], params={
+            'symbol': bingx_symbol(symbol), 'interval': interval,
+            'startTime': cursor, 'endTime': min(end_ms, cursor + step) - 1, 'limit': PAGE_LIMIT,
+        })
+        if resp.get('code') != 0:
+            print(f"[KLINES] {symbol} {interval} fetch failed: {resp.get('msg')}")
+            break
+        for k in resp.get('data') or []:
+            rows.append((int(k['time']), float(k['open']), float(k['high']), float(k['low']), float(k['close']), float(k['volume'])))
+        cursor += step
+    candles = np.array(rows, dtype=KLINE_DTYPE)
+    candles.sort(order='ts')
+    _, unique = np.unique(candles['ts'], return_index=True)
+    return candles[unique]
+
+async def download_for_signals(client, signals, interval='1m', horizon_ms=3 * 86_400_000, directory=KLINES_DIR):
+    """Bring every signal's backtest window into the store, fetching only what is missing."""
+    store = get_store(directory)
+    spans = {}
+    for s in signals:
+        key = symbol_key(s['symbol'])
+        lo, hi = spans.get(key, (s['ts'], s['ts']))
+        spans[key] = (min(lo, s['ts']), max(hi, s['ts'] + horizon_ms))
+
+    async def _one(symbol, lo, hi):
+        first, last = store.first_ts(symbol, interval), store.last_ts(symbol, interval)
+        if first is None:
+            added = store.append(symbol, interval, await fetch_klines(client, symbol, interval, lo, hi))
+            print(f"[KLINES] {symbol}: +{added} candles")
+            return
+        # Only the parts outside the stored range: older signals are prepended, newer appended
+        if lo < first:
+            added = store.prepend(symbol, interval, await fetch_klines(client, symbol, interval, lo, first))
+            print(f"[KLINES] {symbol}: +{added} older candles")
+        if last + INTERVAL_MS[interval] < hi:
+            added = store.append(symbol, interval,
+                                 await fetch_klines(client, symbol, interval, last + INTERVAL_MS[interval], hi))
+            print(f"[KLINES] {symbol}: +{added} candles")
+
+    await asyncio.gather(*(_one(sym, lo, hi) for sym, (lo, hi) in spans.items()))
+
+async def _main():
+    from backtest import load_signals, SIGNALS_FILE
+    from bot_telegram import read_credentials
+    from api import close_session
+    import argparse
+    ap = argparse.ArgumentParser(description="Download candles for every exported signal into the kline store")
+    ap.add_argument('--signals', default=SIGNALS_FILE)
+    ap.add_argument('--interval', default='1m', choices=sorted(INTERVAL_MS))
+    ap.add_argument('--horizon-hours', type=float, default=72)
+    args = ap.parse_args()
+
+    # /quote/klines is a public endpoint; keys are only used for the request signature
+    creds = read_credentials('credentials.txt')
+    client = {'api_key': creds.get('bingx_api_key', ''), 'secret_key': os.environ.get('BINGX_SECRET_KEY', '')}
+    try:
+        await download_for_signals(client, load_signals(args.signals), args.interval, int(args.horizon_hours * 3_600_000))
+    finally:
+        await close_session()
+
+if __name__ == '__main__':
+    asyncio.run(_main())
@@ -0,0 +1,136 @@
+# logs.py – NON-BLOCKING STRUCTURED LOGGING (queue → console + rotating JSON file + crash ring buffer)
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from collections import deque
+
+LOG_FILE = 'bot.log.jsonl'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+RING_SIZE = 2000            # recent records kept in memory for crash dumps
+REPEAT_WINDOW = 60.0        # seconds
+REPEAT_LIMIT = 5            # identical messages let through per window
+CRASH_DUMP_FILE = 'crash_dump.jsonl'
+
+_listener = None
+_ring = deque(maxlen=RING_SIZE)
+
+def get_logger(name):
+    """Logger for one subsystem; shown as [NAME] on the console."""
+    return logging.getLogger(f'bot.{name}')
+
+class RepeatFilter(logging.Filter):
+    """Lets through REPEAT_LIMIT identical records (logger, level, message and args) per
+    window; the first record of the next window carries how many were dropped. Keying on
+    the unformatted message keeps the check cheap on the caller's side."""
+
+    def __init__(self, window=REPEAT_WINDOW, limit=REPEAT_LIMIT):
+        super().__init__()
+        self.window = window
+        self.limit = limit
+        self._seen = {}    # key → [window start, passed, dropped]
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg, record.args)
+        now = time.monotonic()
+        try:
+            state = self._seen.get(key)
+        except TypeError:   # unhashable args (a dict payload) – never suppressed
+            return True
+        if state is None or now - state[0] >= self.window:
+            if state and state[2]:
+                record.suppressed = state[2]
+            self._seen[key] = [now, 1, 0]
+            if len(self._seen) > 10_000:
+                self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.window}
+            return True
+        if state[1] < self.limit:
+            state[1] += 1
+            return True
+        state[2] += 1
+        return False
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the message in the caller; the listener thread does it instead
+    def prepare(self, record):
+        return record
+
+def _message(record):
+    msg = record.getMessage()
+    if getattr(record, 'suppressed', 0):
+        msg += f" (+{record.suppressed} repeats suppressed)"
+    return msg
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name.removeprefix('bot.'),
+            'msg': _message(record),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        stamp = time.strftime('%H:%M:%S', time.localtime(record.created))
+        text = f"{stamp} {record.levelname:<7} [{record.name.removeprefix('bot.').upper()}] {_message(record)}"
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+class RingHandler(logging.Handler):
+    """Keeps the last RING_SIZE records for dump_recent(); they are only formatted on a dump."""
+
+    def emit(self, record):
+        _ring.append(record)
+
+def setup_logging(level='INFO', path=LOG_FILE, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS, console=True):
+    """Route every bot.* logger through one queue; a background thread does the formatting
+    and I/O so logging never blocks the event loop. Safe to call again to reconfigure."""
+    global _listener
+    shutdown_logging()
+    handlers = [RingHandler()]
+    if console:
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(ConsoleFormatter())
+        handlers.append(stream)
+    if path:
+        rotating = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        rotating.setFormatter(JSONFormatter())
+        handlers.append(rotating)
+
+    q = queue.SimpleQueue()
+    handler = _QueueHandler(q)
+    handler.addFilter(RepeatFilter())
+    root = logging.getLogger('bot')
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """Flush the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def dump_recent(path=CRASH_DUMP_FILE):
+    """Write the in-memory ring buffer to `path`; returns the number of records."""
+    formatter = JSONFormatter()
+    records = [formatter.format(r) for r in list(_ring)]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(records) + ('\n' if records else ''))
+    return len(records)
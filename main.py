@@ -1,105 +1,273 @@
 # main.py – FINAL ×10 BOT – LIVE MONEY + TINY TEST MODE
+#   Unattended (systemd): keys from accounts.json, BINGX_API_KEY / BINGX_SECRET_KEY or the
+#   bingx_api_key / bingx_secret_key lines of credentials.txt; BOT_MODE=test|normal skips the prompt.
+import time
+IMPORTED = time.monotonic()
 import asyncio
-import hashlib
-from api import bingx_api_request
-from bot_telegram import parse_signal
-from trade import execute_trade
+import os
+import sys
+from api import close_session, sync_server_time, time_sync_loop, use_simulator
+from bot_telegram import read_credentials
+from signal_file import SignalFileReader
+from dedup import DedupStore, signal_key, legacy_key
+from scheduler import SignalScheduler, fetch_prices
+from marketdata import MarketFeed, prices as cached_prices
+from fanout import Fleet, load_accounts
+from journal import OrderJournal
+from contracts import load_contracts
+from metrics import record, span, summary_loop, start_server
+from logs import get_logger, setup_logging, shutdown_logging, dump_recent
 from config import get_config
-import getpass
 
-print("\n" + "="*70)
-print("   BINGX ×10 FUTURES BOT – LIVE MONEY")
-print("="*70)
+CREDENTIALS_FILE = 'credentials.txt'
+DEDUP_FILE = 'traded_signals.db'
+INTERACTIVE = sys.stdin.isatty()
 
-api_key = getpass.getpass("   Enter BingX API Key      : ").strip()
-secret_key = getpass.getpass("   Enter BingX Secret Key   : ").strip()
+# Set by setup()
+config = None
+clients = None
+test = False
+log = None
+fleet = None
+dedup_file = DEDUP_FILE
+market = MarketFeed()
 
-test = input("   Tiny test mode ($1–$9 + 1–2x) or Normal mode? (t/n) [n]: ").strip().lower() == 't'
-print("   → TINY TEST MODE – $1–$9 + 1–2x leverage" if test else "   → NORMAL MODE – 5.8% + 10x leverage")
-print("="*70 + "\n")
+def since_process_start():
+    """Seconds since the OS started this process (Linux); elsewhere since main.py was imported."""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - IMPORTED
 
-client_bingx = {'api_key': api_key, 'secret_key': secret_key, 'base_url': "https://open-api.bingx.com"}
-config = get_config()
+def load_clients(config):
+    if os.path.exists(config['accounts_file']):
+        clients = load_accounts(config['accounts_file'])
+        print(f"   → {len(clients)} accounts from {config['accounts_file']}: {', '.join(c['name'] for c in clients)}")
+        return clients
+    creds = read_credentials(CREDENTIALS_FILE) if os.path.exists(CREDENTIALS_FILE) else {}
+    api_key = os.environ.get('BINGX_API_KEY') or creds.get('bingx_api_key')
+    secret_key = os.environ.get('BINGX_SECRET_KEY') or creds.get('bingx_secret_key')
+    if api_key and secret_key:
+        print("   → BingX keys from environment / credentials file")
+    elif INTERACTIVE:
+        import getpass
+        api_key = api_key or getpass.getpass("   Enter BingX API Key      : ")
+        secret_key = secret_key or getpass.getpass("   Enter BingX Secret Key   : ")
+    else:
+        sys.exit(f"No BingX keys: create {config['accounts_file']}, set BINGX_API_KEY / BINGX_SECRET_KEY "
+                 f"or add bingx_api_key / bingx_secret_key to {CREDENTIALS_FILE}")
+    return [{'name': 'main', 'api_key': api_key.strip(), 'secret_key': secret_key.strip(),
+             'base_url': "https://open-api.bingx.com"}]
 
-async def get_balance():
-    resp = await bingx_api_request('GET', '/openApi/swap/v2/user/balance', client_bingx['api_key'], client_bingx['secret_key'])
-    if resp.get('code') == 0 and resp.get('data'):
-        bal = resp['data'][0].get('balance', {}).get('availableBalance')
-        if bal is not None:
-            return float(bal)
-    return 6000.0
+def dry_run_path(path):
+    """Same file with a dry_run_ prefix, so simulated trades never touch the live state."""
+    head, tail = os.path.split(path)
+    return os.path.join(head, 'dry_run_' + tail)
 
-async def get_open_positions_count():
-    resp = await bingx_api_request('GET', '/openApi/swap/v2/trade/position', client_bingx['api_key'], client_bingx['secret_key'])
-    return len(resp.get('data', [])) if resp.get('code') == 0 else 0
+def setup():
+    global config, clients, test, log, fleet, dedup_file
+    print("\n" + "="*70)
+    print("   BINGX ×10 FUTURES BOT – LIVE MONEY")
+    print("="*70)
 
-async def print_startup_info():
-    balance = await get_balance()
-    usdt_amount = balance * (config['usdt_per_trade_percent'] / 100)
+    config = get_config()
+    clients = load_clients(config)
+
+    mode = os.environ.get('BOT_MODE', '').strip().lower()
+    if mode in ('test', 'normal') or not INTERACTIVE:
+        test = mode == 'test'
+    else:
+        test = input("   Tiny test mode ($1–$9 + 1–2x) or Normal mode? (t/n) [n]: ").strip().lower() == 't'
+    print("   → TINY TEST MODE – $1–$9 + 1–2x leverage" if test else "   → NORMAL MODE – 5.8% + 10x leverage")
+    print("="*70 + "\n")
+
+    setup_logging(config['log_level'], config['log_file'], config['log_max_mb'] * 1024 * 1024, config['log_backups'])
+    log = get_logger('main')
+
+    journal_file = config['journal_file']
+    if config['dry_run_mode']:
+        # Orders go to the in-process exchange simulator instead of BingX. Its own journal and
+        # dedup store: reconciling the live journal against an empty simulator would close every
+        # real trade, and simulated entries would use up the live daily budget
+        from simulator import SimExchange
+        use_simulator(SimExchange(balance=config['dry_run_balance']))
+        journal_file, dedup_file = dry_run_path(journal_file), dry_run_path(DEDUP_FILE)
+        print(f"   → DRY RUN – orders are filled by the local BingX simulator ({journal_file}, {dedup_file})\n")
+
+    fleet = Fleet(clients, config, journal=OrderJournal(journal_file))
+
+def trade_size(balance, percent):
+    usdt_amount = (balance if balance is not None else 6000.0) * (percent / 100)
     if test:
         usdt_amount = max(1.0, min(9.0, usdt_amount))
+    return usdt_amount
 
+async def print_startup_info():
     print("STARTUP SUMMARY")
     print("-" * 50)
-    print(f"Available Balance : ${balance:,.2f}")
-    if test:
-        print("Trade Size        : $1–$9 (tiny mode)")
-    else:
-        print(f"Trade Size        : {config['usdt_per_trade_percent']}% (~${usdt_amount:,.0f})")
+    for member, snap in await fleet.snapshots():
+        balance = snap.balance if snap else None
+        percent = member.client.get('usdt_per_trade_percent') or config['usdt_per_trade_percent']
+        shown = f"${balance:,.2f}" if balance is not None else "unavailable"
+        print(f"Available Balance : {shown} [{member.name}]")
+        if test:
+            print("Trade Size        : $1–$9 (tiny mode)")
+        else:
+            print(f"Trade Size        : {percent}% (~${trade_size(balance, percent):,.0f})")
     print(f"Leverage          : {'1x–2x' if test else '10x'}")
     print(f"Max Open Positions: {config['max_open_positions']}")
     print(f"TP Split          : {config['tp1_close_percent']}% / {config['tp2_close_percent']}% / {config['tp3_close_percent']}% / {config['tp4_close_percent']}%")
     print(f"Trailing Stop     : After TP{config['trailing_activate_after_tp']} – {config['trailing_callback_rate']}% callback")
-    print(f"Stop Loss         : Max {config['stop_loss_percent']}%")
+    print(f"Stop Loss         : {'Max ' + str(config['stop_loss_percent']) + '%' if config['cap_stop_loss'] else 'As signalled'}")
     print("-" * 50 + "\n")
 
+signal_file = SignalFileReader('telegram_messages.txt')
+
+def _key(symbol):
+    return symbol.replace('/', '').replace('-', '').upper()
+
+async def collect_signals(scheduler, traded_hashes, signal_queue=None):
+    """Queue every new untraded signal in the scheduler. Waits at most one tick while signals
+    are pending (so they are re-ranked and expired), otherwise until something arrives."""
+    if signal_queue is not None:
+        try:
+            timeout = config['check_interval_seconds'] if scheduler else None
+            signals = [await asyncio.wait_for(signal_queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            signals = []
+        while not signal_queue.empty():     # a burst is admitted as one batch
+            signals.append(signal_queue.get_nowait())
+    else:
+        with span('ingest'):
+            signals = signal_file.read_signals()
+        received = time.perf_counter()
+        for signal in signals:
+            signal['received_at'] = received
+        if not signals:
+            await asyncio.sleep(config['check_interval_seconds'])
+
+    for signal in signals:
+        h = signal_key(signal['raw_text'])
+        if h not in traded_hashes and legacy_key(signal['raw_text']) not in traded_hashes:
+            scheduler.push(signal, h)
+
+async def trade_signal(signal, h, ready, traded_hashes):
+    lev = min(signal['leverage'], 2 if test else 10)
+    log.info("NEW SIGNAL → %s %s %sx on %d/%d accounts", signal['symbol'], signal['direction'], lev,
+             len(ready), len(fleet.members),
+             extra={'fields': {'symbol': signal['symbol'], 'direction': signal['direction'], 'leverage': lev,
+                               'accounts': len(ready), 'message_id': signal.get('message_id')}})
+    # Recorded before sending so a crash mid-trade never re-trades the signal on restart
+    traded_hashes.add(h, message_id=signal.get('message_id'), outcome='sending')
+    if signal.get('received_at'):
+        record('signal_to_send', time.perf_counter() - signal['received_at'])
+    report = await fleet.execute(signal, lev, ready, trade_size)
+    entered = any(r['outcome'] and r['outcome']['entry']['ok'] for r in report['results'])
+    traded_hashes.add(h, message_id=signal.get('message_id'), outcome='traded' if entered else 'skipped')
+    for result in report['results']:
+        outcome = result['outcome']
+        if outcome and outcome['received_at']:
+            record('signal_to_entry_ack', outcome['entry']['acked_at'] - outcome['received_at'])
+            if outcome['protected']:
+                record('signal_to_protected', max(leg['acked_at'] for leg in outcome['legs']) - outcome['received_at'])
+
+def refresh_config(scheduler):
+    """Pick up edits to bot_config.json: one new read-only snapshot replaces the old everywhere."""
+    global config
+    latest = get_config()
+    if latest is not config:
+        config = latest
+        fleet.reconfigure(config)
+        scheduler.config = config
+
 async def main_loop():
+    signal_queue = None
+    # Connection pools, clock offset, contract specs, account state and the Telegram session
+    # are independent – bring them all up at once
+    warm_up = [fleet.start(), sync_server_time(), load_contracts(clients[0])]
+    if config['signal_source'] == 'telegram':
+        from bot_telegram import start_signal_listener
+        signal_queue = asyncio.Queue()
+        warm_up.append(start_signal_listener(signal_queue))
+    await asyncio.gather(*warm_up)
+    time_sync = asyncio.create_task(time_sync_loop())
+    market.track(fleet.open_symbols())
+    market.start()
+    traded_hashes = DedupStore(dedup_file, window_hours=config['dedup_window_hours'])
+    len(traded_hashes)   # load now rather than on the first signal
+    if config['metrics_port']:
+        await start_server(config['metrics_port'])
+
+    ready_in = since_process_start()
+    record('startup', ready_in)
+    log.info("×10 BOT READY in %.2fs from process start – waiting for new signals...", ready_in,
+             extra={'fields': {'startup_seconds': ready_in}})
     await print_startup_info()
-    print("×10 BOT STARTED – Waiting for new signals...\n")
-    traded_hashes = set()
+    metrics_summary = asyncio.create_task(summary_loop(config['metrics_interval_seconds']))
+    scheduler = SignalScheduler(config)
 
     while True:
         try:
-            balance = await get_balance()
-            usdt_amount = balance * (config['usdt_per_trade_percent'] / 100)
-            if test:
-                usdt_amount = max(1.0, min(9.0, usdt_amount))
-
-            open_count = await get_open_positions_count()
-            if open_count >= config['max_open_positions']:
-                await asyncio.sleep(config['check_interval_seconds'])
+            await collect_signals(scheduler, traded_hashes, signal_queue)
+            # After the wait (hours in telegram mode with nothing pending), so what is admitted
+            # next trades on the current file
+            refresh_config(scheduler)
+            market.track(scheduler.symbols() | fleet.open_symbols())
+            if not scheduler:
                 continue
 
-            with open('telegram_messages.txt', 'r', encoding='utf-8') as f:
-                content = f.read()
+            max_open = config['max_open_positions']
 
-            new_signal = None
-            for block in content.split('==='):
-                signal = parse_signal(block)
-                if signal:
-                    h = hashlib.md5(signal['raw_text'].encode()).hexdigest()
-                    if h not in traded_hashes:
-                        new_signal = (signal, h)
-                        break
-
-            if not new_signal:
-                await asyncio.sleep(config['check_interval_seconds'])
+            checks_started = time.perf_counter()
+            prices = cached_prices()
+            if any(_key(symbol) not in prices for symbol in scheduler.symbols()):
+                # Just subscribed – one bulk REST call until the stream has a price
+                ready, fetched = await asyncio.gather(fleet.with_room(max_open), fetch_prices(clients[0]))
+                prices = {**fetched, **prices}
+            else:
+                ready = await fleet.with_room(max_open)
+            # Each admitted signal takes one slot on every account it goes to
+            slots = max((max_open - snap.open_count for _, snap in ready), default=0)
+            # A 'sending' row is only left behind by a crash mid-trade; it may have filled, so it counts
+            budget = config['max_trades_per_day'] - traded_hashes.count_since(time.time() - 86400, ('traded', 'sending'))
+            admitted, expired = scheduler.admit(prices, min(slots, max(budget, 0)))
+            record('risk_checks', time.perf_counter() - checks_started)
+            for signal, h in expired:
+                traded_hashes.add(h, message_id=signal.get('message_id'), outcome='expired')
+            if budget <= 0 and scheduler:
+                log.info("Daily trade limit (%d) reached – %d signals waiting", config['max_trades_per_day'], len(scheduler))
+            if not admitted:
                 continue
 
-            signal, h = new_signal
-            lev = min(signal['leverage'], 2 if test else 10)
-
-            print(f"NEW SIGNAL → {signal['symbol']} {signal['direction']} {lev}x – ${usdt_amount:.2f}")
-            await execute_trade(client_bingx, signal, usdt_amount, leverage=lev, config=config)
-
-            traded_hashes.add(h)
-            print(f"Trade executed – unique today: {len(traded_hashes)}\n")
-
-            await asyncio.sleep(config['check_interval_seconds'])
+            await asyncio.gather(*(
+                trade_signal(signal, h, [(m, snap) for m, snap in ready if max_open - snap.open_count > i], traded_hashes)
+                for i, (signal, h) in enumerate(admitted)))
+            log.info("%d signals sent – %d pending, unique in window: %d", len(admitted), len(scheduler),
+                     len(traded_hashes))
 
         except Exception as e:
-            print(f"[ERROR] {e}\n")
+            log.exception("Main loop error: %s", e)
             await asyncio.sleep(30)
 
+async def run():
+    try:
+        await main_loop()
+    except BaseException as e:
+        if not isinstance(e, (KeyboardInterrupt, asyncio.CancelledError)):
+            log.critical("Fatal error: %r", e, exc_info=True)
+            shutdown_logging()   # drains the queue so the ring buffer holds the final records
+            print(f"Crash dump: {dump_recent()} recent log records written")
+        raise
+    finally:
+        await market.stop()
+        await fleet.stop()
+        await close_session()
+        shutdown_logging()
+
 if __name__ == '__main__':
-    asyncio.run(main_loop())
\ No newline at end of file
+    setup()
+    asyncio.run(run())
@@ -0,0 +1,196 @@
+# marketdata.py – SHARED MARK-PRICE / TICKER STREAM AND IN-MEMORY LATEST-PRICE TABLE
+import asyncio
+import gzip
+import json
+import time
+from typing import NamedTuple
+import aiohttp
+from api import get_session, get_simulator
+from metrics import record
+from logs import get_logger
+
+log = get_logger('market')
+
+STREAM_URL = "wss://open-api-swap.bingx.com/swap-market"
+MAX_AGE = 10.0          # seconds before a cached price no longer counts
+RECONNECT_DELAY = 5
+STREAMS = ('markPrice', 'ticker')
+
+class Quote(NamedTuple):
+    mark: float | None
+    last: float | None
+    updated_at: float       # time.time() of the last update
+
+    @property
+    def price(self):
+        return self.last if self.last is not None else self.mark
+
+    def age(self):
+        return time.time() - self.updated_at
+
+# key → Quote. Each entry is replaced in a single assignment, so readers never need a lock
+_quotes = {}
+
+def _key(symbol):
+    return symbol.replace('/', '').replace('-', '').upper()
+
+def _bingx(key):
+    return f"{key[:-4]}-USDT" if key.endswith('USDT') else key
+
+def latest(symbol, max_age=MAX_AGE):
+    """Cached Quote for `symbol`, or None when unknown or older than `max_age` seconds."""
+    quote = _quotes.get(_key(symbol))
+    return quote if quote is not None and quote.age() <= max_age else None
+
+def prices(max_age=MAX_AGE):
+    """{BTCUSDT: price} of every fresh quote."""
+    now = time.time()
+    return {k: q.price for k, q in _quotes.items() if now - q.updated_at <= max_age}
+
+def _update(key, mark=None, last=None, event_time=None):
+    old = _quotes.get(key)
+    _quotes[key] = Quote(mark if mark is not None else (old.mark if old else None),
+                         last if last is not None else (old.last if old else None), time.time())
+    if event_time:
+        record('market.lag', max(0.0, time.time() - event_time / 1000))
+
+# === PRE-TRADE CHECKS (local lookups) ===
+def entry_distance(signal, price):
+    """How far `price` sits outside the entry range, in % of the entry (0 inside the range).
+    Positive means the market moved away in the trade's favour (entry already passed)."""
+    lo, hi = signal['entry_min'], signal['entry_max']
+    if lo > hi:
+        lo, hi = hi, lo
+    if lo <= price <= hi:
+        return 0.0
+    long = signal['direction'] == 'LONG'
+    edge = hi if price > hi else lo
+    away = (price - edge) / signal['entry'] * 100
+    return away if long else -away
+
+def signal_problem(signal, price, config):
+    """Why the signal is no longer worth entering at `price`, or None."""
+    long = signal['direction'] == 'LONG'
+    if (price <= signal['stoploss']) if long else (price >= signal['stoploss']):
+        return f"stop loss {signal['stoploss']} already hit (price {price})"
+    tp1 = signal['targets'][0]
+    if (price >= tp1) if long else (price <= tp1):
+        return f"TP1 {tp1} already reached (price {price})"
+    if entry_distance(signal, price) > config['entry_tolerance_percent']:
+        return f"entry {signal['entry_min']}–{signal['entry_max']} passed (price {price})"
+    return None
+
+def pre_trade_problem(signal, config, stop=None):
+    """signal_problem() against the cached price, plus whether `stop` (the capped stop that
+    will be placed, if any) is already hit. None when fine or when no fresh price is cached."""
+    quote = latest(signal['symbol'])
+    if quote is None or quote.price is None:
+        return None
+    price = quote.price
+    problem = signal_problem(signal, price, config)
+    if problem:
+        return problem
+    if stop is not None and stop != signal['stoploss']:
+        if (price <= stop) if signal['direction'] == 'LONG' else (price >= stop):
+            return f"capped stop {stop:g} already hit (price {price})"
+    return None
+
+# === STREAM ===
+class MarketFeed:
+    """One market-data WebSocket shared by the whole bot.
+
+    track() sets the symbols of interest (pending signals and open positions); the feed
+    subscribes to their mark-price and ticker streams and drops the rest, so the table only
+    holds prices someone can use. Under the simulator, its price moves are used instead.
+    """
+
+    def __init__(self):
+        self.wanted = set()
+        self._subscribed = set()
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def track(self, symbols):
+        wanted = {_key(s) for s in symbols}
+        if wanted != self.wanted:
+            self.wanted = wanted
+            self._changed.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        sim = get_simulator()
+        if sim is not None:
+            await self._sim_stream(sim)
+            return
+        while True:
+            try:
+                async with get_session().ws_connect(STREAM_URL, heartbeat=20) as ws:
+                    log.info("Market stream connected")
+                    self._subscribed = set()
+                    subscriber = asyncio.create_task(self._subscribe_loop(ws))
+                    try:
+                        await self._read(ws)
+                    finally:
+                        subscriber.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Market stream error: %s", e)
+            log.info("Market stream closed – reconnecting in %ss", RECONNECT_DELAY)
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _subscribe_loop(self, ws):
+        while True:
+            self._changed.clear()
+            added, removed = self.wanted - self._subscribed, self._subscribed - self.wanted
+            for kind, keys in (('sub', added), ('unsub', removed)):
+                for key in keys:
+                    for stream in STREAMS:
+                        await ws.send_str(json.dumps({'id': f"{key}-{stream}", 'reqType': kind,
+                                                      'dataType': f"{_bingx(key)}@{stream}"}))
+            for key in removed:
+                _quotes.pop(key, None)
+            self._subscribed = set(self.wanted)
+            if added or removed:
+                log.debug("Market subscriptions: %s", ', '.join(sorted(self._subscribed)) or 'none')
+            await self._changed.wait()
+
+    async def _read(self, ws):
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.BINARY:
+                text = gzip.decompress(msg.data).decode('utf-8')
+            elif msg.type == aiohttp.WSMsgType.TEXT:
+                text = msg.data
+            else:
+                break
+            if text == 'Ping':
+                await ws.send_str('Pong')
+                continue
+            self._handle(json.loads(text).get('data'))
+
+    def _handle(self, data):
+        if not isinstance(data, dict) or 's' not in data:
+            return
+        key = _key(data['s'])
+        if key not in self.wanted:
+            return
+        if data.get('e') == 'markPriceUpdate':
+            _update(key, mark=float(data['p']), event_time=data.get('E'))
+        elif data.get('e') == '24hTicker':
+            _update(key, last=float(data['c']), event_time=data.get('E'))
+
+    async def _sim_stream(self, sim):
+        queue = sim.subscribe_market()
+        try:
+            while True:
+                self._handle(await queue.get())
+        finally:
+            sim.unsubscribe_market(queue)
@@ -0,0 +1,153 @@
+# metrics.py – HOT-PATH LATENCY SPANS IN HDR-STYLE HISTOGRAMS (periodic summary + local /metrics)
+import asyncio
+import json
+import time
+from logs import get_logger
+
+log = get_logger('metrics')
+
+# Log-linear buckets: exact below 128µs, then 64 sub-buckets per power of two (≤1.6% error)
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+HALF = SUB_COUNT // 2
+BUCKETS = SUB_COUNT + 40 * HALF      # covers ~2^46µs – far beyond any span we time
+
+METRICS_INTERVAL = 300   # seconds between printed summaries
+PERCENTILES = (50, 90, 99, 99.9)
+
+def _index(us):
+    if us < SUB_COUNT:
+        return us
+    shift = us.bit_length() - SUB_BITS
+    return min(BUCKETS - 1, SUB_COUNT + (shift - 1) * HALF + (us >> shift) - HALF)
+
+def _upper(idx):
+    """Highest value (µs) that lands in bucket idx."""
+    if idx < SUB_COUNT:
+        return idx
+    shift = (idx - SUB_COUNT) // HALF + 1
+    top = (idx - SUB_COUNT) % HALF + HALF
+    return ((top + 1) << shift) - 1
+
+class Histogram:
+    """Fixed-size latency histogram in microseconds; record() is O(1) and allocation-free."""
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.reset()
+
+    def reset(self):
+        for i in range(BUCKETS):
+            self.counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, seconds):
+        us = int(seconds * 1_000_000) if seconds > 0 else 0
+        self.counts[_index(us)] += 1
+        self.count += 1
+        self.total += us
+        if self.min is None or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        rank = max(1, int(self.count * q / 100 + 0.5))
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_upper(idx), self.max)
+        return self.max
+
+    def summary(self):
+        """count plus min / mean / percentiles / max in milliseconds."""
+        result = {'count': self.count}
+        if self.count:
+            result['min'] = self.min / 1000
+            result['mean'] = self.total / self.count / 1000
+            for q in PERCENTILES:
+                result[f'p{q:g}'] = self.percentile(q) / 1000
+            result['max'] = self.max / 1000
+        return result
+
+_histograms = {}
+
+def histogram(name):
+    h = _histograms.get(name)
+    if h is None:
+        h = _histograms[name] = Histogram()
+    return h
+
+def record(name, seconds):
+    histogram(name).record(seconds)
+
+class span:
+    """`with span('parse'):` records the block's wall time (awaits included) under `name`."""
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        histogram(self.name).record(time.perf_counter() - self.started)
+        return False
+
+def snapshot():
+    return {name: h.summary() for name, h in sorted(_histograms.items())}
+
+def reset():
+    for h in _histograms.values():
+        h.reset()
+
+def format_summary():
+    lines = [f"{'span':<24}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)"]
+    for name, s in snapshot().items():
+        if s['count']:
+            lines.append(f"{name:<24}{s['count']:>8}{s['p50']:>10.2f}{s['p90']:>10.2f}{s['p99']:>10.2f}{s['max']:>10.2f}")
+    return '\n'.join(lines)
+
+async def summary_loop(interval=METRICS_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        if any(h.count for h in _histograms.values()):
+            log.info("Latency since start\n%s", format_summary())
+
+async def _serve(reader, writer):
+    try:
+        request = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request.split()
+        if len(parts) >= 2 and parts[1].split(b'?')[0] == b'/metrics':
+            body, status = json.dumps(snapshot(), indent=1).encode(), b'200 OK'
+        else:
+            body, status = b'{"error": "not found"}', b'404 Not Found'
+        writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: ' + str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n' + body)
+        await writer.drain()
+    except Exception as e:
+        log.warning("Request failed: %s", e)
+    finally:
+        writer.close()
+
+async def start_server(port, host='127.0.0.1'):
+    """Serve GET /metrics (JSON snapshot) on localhost. Returns None when the port is taken –
+    a lingering previous process must not stop the bot from starting."""
+    try:
+        server = await asyncio.start_server(_serve, host, port)
+    except OSError as e:
+        log.warning("Metrics endpoint disabled – cannot listen on %s:%s: %s", host, port, e)
+        return None
+    log.info("Serving http://%s:%s/metrics", host, port)
+    return server
@@ -0,0 +1,103 @@
+# ratelimit.py – CLIENT-SIDE BINGX RATE LIMITER (token bucket per endpoint group + priorities)
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+# Lower number = served first when a group is saturated
+PRIORITY_STOP = 0       # stop loss / protective orders
+PRIORITY_ENTRY = 1      # entry orders
+PRIORITY_ORDER = 2      # TPs, trailing, leverage/margin, cancels
+PRIORITY_ACCOUNT = 3    # balance / positions
+PRIORITY_HOUSEKEEPING = 4
+
+# group → (requests per second, burst)
+RATE_LIMITS = {
+    'order': (10.0, 10),
+    'account': (5.0, 5),
+    'market': (20.0, 20),
+}
+
+RATE_LIMIT_CODES = {100410, 429}   # BingX "frequency limit" style error codes
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 8.0
+
+class TokenBucket:
+    """Token bucket whose waiters are released in priority order, then FIFO."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority=PRIORITY_ORDER):
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._schedule()
+        await fut
+
+    def penalize(self, seconds):
+        """Drain the bucket so the group pauses for `seconds` (after a 429 / rate-limit code)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def _schedule(self):
+        if self._timer is None and self._waiters:
+            delay = max(0.0, (1 - self.tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    def _wake(self):
+        self._timer = None
+        self._refill()
+        while self._waiters and self.tokens >= 1:
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.tokens -= 1
+            fut.set_result(None)
+        self._schedule()
+
+_buckets = {}   # (account, group) → TokenBucket; BingX limits each API key separately
+
+def bucket(group, account=''):
+    key = (account, group)
+    if key not in _buckets:
+        rate, burst = RATE_LIMITS.get(group, RATE_LIMITS['account'])
+        _buckets[key] = TokenBucket(rate, burst)
+    return _buckets[key]
+
+def classify(method, path, data=None):
+    """Return (group, priority) for a BingX call."""
+    if '/quote/' in path or '/server/' in path:
+        return 'market', PRIORITY_HOUSEKEEPING
+    if method != 'GET' and '/trade/' in path:
+        order_type = (data or {}).get('type', '')
+        if order_type in ('STOP_MARKET', 'STOP'):
+            return 'order', PRIORITY_STOP
+        if order_type in ('LIMIT', 'MARKET'):
+            return 'order', PRIORITY_ENTRY
+        return 'order', PRIORITY_ORDER
+    if '/userDataStream' in path:
+        return 'account', PRIORITY_HOUSEKEEPING
+    return 'account', PRIORITY_ACCOUNT
+
+def backoff_delay(attempt, base=BACKOFF_BASE, retry_after=None):
+    """Jittered exponential backoff; honours a server Retry-After when given."""
+    if retry_after:
+        return retry_after + random.uniform(0, base)
+    ceiling = min(BACKOFF_CAP, base * (2 ** attempt))
+    return random.uniform(ceiling / 2, ceiling)
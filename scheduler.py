@@ -0,0 +1,92 @@
+# scheduler.py – PENDING SIGNALS RANKED BY FRESHNESS / ENTRY DISTANCE / LEVERAGE, ADMITTED PER TICK
+import heapq
+import time
+from api import bingx_api_request
+from marketdata import entry_distance, signal_problem
+from logs import get_logger
+
+log = get_logger('scheduler')
+
+PRICE_PATH = '/openApi/swap/v2/quote/price'
+
+def _key(symbol):
+    return symbol.replace('/', '').replace('-', '').upper()
+
+async def fetch_prices(client):
+    """Last price of every contract in one call → {BTCUSDT: price}."""
+    resp = await bingx_api_request('GET', PRICE_PATH, client['api_key'], client['secret_key'])
+    if resp.get('code') != 0:
+        log.warning("Price fetch failed: %s", resp.get('msg'))
+        return {}
+    data = resp.get('data') or []
+    if isinstance(data, dict):
+        data = [data]
+    return {_key(p['symbol']): float(p['price']) for p in data if p.get('price')}
+
+class SignalScheduler:
+    """Holds signals that are waiting for a free position slot.
+
+    Every admission ranks what is pending by score = age in minutes × age_weight +
+    |distance from the entry range| % × distance_weight + leverage × leverage_weight (lower
+    first), after expiring signals that are too old, whose entry has already run more than
+    entry_tolerance_percent in the trade's favour, that reached TP1, or whose stop was hit.
+    Age counts from the channel post when known (`posted_at`), else from receipt.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.pending = {}       # dedup key → signal
+
+    def __len__(self):
+        return len(self.pending)
+
+    def push(self, signal, key):
+        if key in self.pending:
+            return
+        if not signal.get('received_at'):
+            signal['received_at'] = time.perf_counter()
+        self.pending[key] = signal
+
+    def _expired(self, signal, price, age):
+        if age > self.config['signal_max_age_minutes'] * 60:
+            return f"older than {self.config['signal_max_age_minutes']} min"
+        return None if price is None else signal_problem(signal, price, self.config)
+
+    def symbols(self):
+        return {signal['symbol'] for signal in self.pending.values()}
+
+    def admit(self, prices, slots):
+        """Rank what is pending against `prices` ({BTCUSDT: last price}).
+
+        Returns (admitted, expired): up to `slots` (signal, key) pairs best first – at most one
+        per symbol – and the (signal, key) pairs dropped as stale.
+        """
+        cfg = self.config
+        now, wall = time.perf_counter(), time.time()
+        ranked, expired = [], []
+        for key, signal in list(self.pending.items()):
+            # Age since the channel post when known – a re-read history file is not fresh
+            posted_at = signal.get('posted_at')
+            age = wall - posted_at if posted_at else now - signal['received_at']
+            price = prices.get(_key(signal['symbol']))
+            reason = self._expired(signal, price, age)
+            if reason:
+                expired.append((self.pending.pop(key), key))
+                log.info("Expired %s %s – %s", signal['symbol'], signal['direction'], reason)
+                continue
+            distance = abs(entry_distance(signal, price)) if price is not None else 0.0
+            score = (age / 60 * cfg['scheduler_age_weight']
+                     + distance * cfg['scheduler_distance_weight']
+                     + signal['leverage'] * cfg['scheduler_leverage_weight'])
+            ranked.append((score, -signal['received_at'], key))
+
+        admitted, symbols = [], set()
+        heapq.heapify(ranked)
+        while ranked and len(admitted) < slots:
+            _, _, key = heapq.heappop(ranked)
+            symbol = _key(self.pending[key]['symbol'])
+            if symbol in symbols:
+                continue        # the same contract twice in one batch would net into one position
+            symbols.add(symbol)
+            admitted.append((self.pending.pop(key), key))
+        return admitted, expired
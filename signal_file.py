@@ -0,0 +1,76 @@
+# signal_file.py – INCREMENTAL READER FOR telegram_messages.txt
+import codecs
+import os
+import re
+from datetime import datetime, timezone
+from bot_telegram import parse_signal
+from logs import get_logger
+
+log = get_logger('file')
+
+SEPARATOR = '==='
+# "[2025-01-31 12:00:00] ID: 1234" – written by download_100_signals.py, dates in UTC
+_HEADER = re.compile(r'\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\]\s*ID:\s*(\d+)')
+
+class SignalFileReader:
+    """Tails the signal file and parses only blocks that completed since the last read.
+
+    Keeps a byte offset and inode; a replaced (rotated) or truncated file is re-read from the start.
+    """
+
+    def __init__(self, path='telegram_messages.txt'):
+        self.path = path
+        self._reset(None)
+
+    def _reset(self, inode):
+        self.inode = inode
+        self.offset = 0
+        self.buffer = ''
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def read_blocks(self):
+        """Return the text blocks completed since the previous call."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            if self.inode is not None:
+                log.info("%s rotated or truncated – re-reading from start", self.path)
+            self._reset(st.st_ino)
+
+        if st.st_size == self.offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+        self.buffer += self.decoder.decode(chunk)
+
+        parts = self.buffer.split(SEPARATOR)
+        # Text after the last separator may still be mid-write; it only counts as a
+        # block once it ends with a newline and parses as a full signal
+        tail = parts.pop()
+        blocks = [p for p in parts if p.strip()]
+        if tail.endswith('\n') and parse_signal(tail):
+            blocks.append(tail)
+            tail = ''
+        self.buffer = tail
+        return blocks
+
+    def read_signals(self):
+        """Parsed signals from the newly completed blocks, in file order. Blocks with a
+        "[date] ID: n" header get `posted_at` and `message_id` from it."""
+        signals = []
+        for block in self.read_blocks():
+            signal = parse_signal(block)
+            if signal:
+                header = _HEADER.search(block)
+                if header:
+                    posted = datetime.strptime(header.group(1), '%Y-%m-%d %H:%M:%S')
+                    signal['posted_at'] = posted.replace(tzinfo=timezone.utc).timestamp()
+                    signal['message_id'] = int(header.group(2))
+                signals.append(signal)
+        return signals
@@ -0,0 +1,523 @@
+# simulator.py – IN-PROCESS BINGX SWAP SIMULATOR FOR DRY RUNS AND OFFLINE LOAD TESTS
+#
+#   python simulator.py --count 500 --concurrency 50               trade exported signals against it
+#   python simulator.py --latency 0.05 --jitter 0.05 --error-rate 0.02 --replay-hours 24 --unthrottled
+import asyncio
+import json
+import math
+import random
+import time
+from urllib.parse import unquote
+
+FEE_RATE = 0.0005
+DEFAULT_LEVERAGE = 10
+CONDITIONAL_TYPES = ('TAKE_PROFIT_MARKET', 'STOP_MARKET', 'TRAILING_STOP_MARKET')
+
+# BingX error codes the simulator answers with
+INVALID_PARAMS = 109400
+INSUFFICIENT_MARGIN = 101204
+ORDER_NOT_EXIST = 80018
+API_NOT_EXIST = 100400
+
+def _key(symbol):
+    return symbol.replace('/', '').replace('-', '').upper()
+
+def _bingx(key):
+    return key[:-4] + '-USDT' if key.endswith('USDT') else key
+
+def _num(x):
+    return f"{x:.10g}"
+
+class SimExchange:
+    """A one-way-mode USDT-M futures account that answers the /openApi/swap/v2/... calls
+    bingx_api_request makes, so the whole order path runs without the network.
+
+    Prices come from set_price() / replay(); every tick fills marketable LIMIT orders and
+    fires TAKE_PROFIT_MARKET, STOP_MARKET and TRAILING_STOP_MARKET orders at their full size.
+    As on BingX, only reduceOnly='true' orders are limited to closing the position (and are
+    cancelled once it is flat); any other order that outsizes the position flips it.
+    Fills, positions and balance changes are pushed to subscribers in the user-data stream
+    format account.py reads.
+    """
+
+    def __init__(self, balance=10_000.0, latency=0.0, jitter=0.0, fee_rate=FEE_RATE, seed=None):
+        self.wallet = float(balance)
+        self.latency = latency           # seconds added to every request
+        self.jitter = jitter             # + uniform(0, jitter)
+        self.fee_rate = fee_rate
+        self.rng = random.Random(seed)
+        self.prices = {}                 # key → last price
+        self.contracts = {}              # key → raw contract dict as BingX returns it
+        self.leverage = {}               # key → leverage
+        self.positions = {}              # key → {'amt', 'entry', 'margin'}
+        self.orders = {}                 # orderId → order dict (open orders only)
+        self.faults = []
+        self.stats = {'requests': 0, 'orders': 0, 'fills': 0, 'cancels': 0, 'rejects': 0, 'faults': 0}
+        self.realized = 0.0
+        self.fees = 0.0
+        self._next_id = 1_900_000_000_000_000_000
+        self._subscribers = []
+        self._market_subscribers = []
+
+    # === MARKET ===
+    def add_symbol(self, symbol, price=None, price_precision=None, qty_precision=3, min_qty=0.0, min_notional=2.0):
+        key = _key(symbol)
+        if price_precision is None:
+            price_precision = max(2, 5 - int(math.floor(math.log10(price)))) if price else 4
+        self.contracts[key] = {
+            'symbol': _bingx(key),
+            'pricePrecision': price_precision,
+            'quantityPrecision': qty_precision,
+            'tradeMinQuantity': min_qty,
+            'tradeMinUSDT': min_notional,
+        }
+        if price:
+            self.set_price(key, price)
+
+    def set_price(self, symbol, price):
+        """Move the mark price and run matching for that symbol."""
+        key = _key(symbol)
+        self.prices[key] = float(price)
+        if self._market_subscribers:
+            event = {'e': 'markPriceUpdate', 'E': int(time.time() * 1000), 's': _bingx(key), 'p': _num(price)}
+            for queue in self._market_subscribers:
+                queue.put_nowait(event)
+        self._match(key)
+
+    async def replay(self, symbol, candles, delay=0.0):
+        """Feed candles (KLINE_DTYPE records or dicts) as open → nearer extreme → other extreme → close."""
+        for c in candles:
+            o, h, l, cl = float(c['open']), float(c['high']), float(c['low']), float(c['close'])
+            path = (o, l, h, cl) if cl >= o else (o, h, l, cl)
+            for price in path:
+                self.set_price(symbol, price)
+            if delay:
+                await asyncio.sleep(delay)
+
+    def subscribe_market(self):
+        """Queue of markPriceUpdate events for every price move."""
+        queue = asyncio.Queue()
+        self._market_subscribers.append(queue)
+        return queue
+
+    def unsubscribe_market(self, queue):
+        if queue in self._market_subscribers:
+            self._market_subscribers.remove(queue)
+
+    # === FAULTS ===
+    def inject(self, code, msg='simulated error', path=None, times=1, probability=1.0, status=200, retry_after=None):
+        """Answer matching requests with `code`. times=None keeps the fault forever."""
+        self.faults.append({'code': code, 'msg': msg, 'path': path, 'times': times,
+                            'probability': probability, 'status': status, 'retry_after': retry_after})
+
+    def _fault(self, path):
+        for fault in self.faults:
+            if fault['path'] not in (None, path):
+                continue
+            if self.rng.random() >= fault['probability']:
+                continue
+            if fault['times'] is not None:
+                fault['times'] -= 1
+                if fault['times'] <= 0:
+                    self.faults.remove(fault)
+            return fault
+        return None
+
+    # === USER-DATA STREAM ===
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def _emit(self, event):
+        event['E'] = int(time.time() * 1000)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def _order_event(self, order, exec_type, fill_price=None, fee=0.0, realized=0.0):
+        self._emit({'e': 'ORDER_TRADE_UPDATE', 'o': {
+            's': _bingx(order['key']), 'c': order['clientOrderId'], 'i': order['orderId'], 'S': order['side'], 'o': order['type'],
+            'q': _num(order['qty']), 'p': _num(order['price']), 'sp': _num(order['stopPrice']),
+            'ap': _num(fill_price or 0), 'x': exec_type, 'X': order['status'], 'N': 'USDT',
+            'n': _num(-fee), 'rp': _num(realized), 'z': _num(order['qty'] if fill_price else 0),
+            'T': int(time.time() * 1000),
+        }})
+
+    def _account_event(self, key):
+        pos = self.positions.get(key) or {'amt': 0.0, 'entry': 0.0, 'margin': 0.0}
+        self._emit({'e': 'ACCOUNT_UPDATE', 'a': {
+            'm': 'ORDER',
+            'B': [{'a': 'USDT', 'wb': _num(self.wallet), 'cw': _num(self.available())}],
+            'P': [{'s': _bingx(key), 'pa': _num(pos['amt']), 'ep': _num(pos['entry']),
+                   'up': _num(self._unrealized(key)), 'mt': 'isolated', 'iw': _num(pos['margin']), 'ps': 'BOTH'}],
+        }})
+
+    # === ACCOUNTING ===
+    def used_margin(self):
+        return sum(p['margin'] for p in self.positions.values())
+
+    def available(self):
+        return self.wallet - self.used_margin()
+
+    def _unrealized(self, key):
+        pos = self.positions.get(key)
+        if not pos or not pos['amt']:
+            return 0.0
+        return pos['amt'] * (self.prices.get(key, pos['entry']) - pos['entry'])
+
+    def equity(self):
+        return self.wallet + sum(self._unrealized(k) for k in self.positions)
+
+    def _fill(self, order, price):
+        key = order['key']
+        pos = self.positions.setdefault(key, {'amt': 0.0, 'entry': 0.0, 'margin': 0.0})
+        amt = pos['amt']
+        delta = order['qty'] if order['side'] == 'BUY' else -order['qty']
+
+        if order['close_only']:
+            if amt == 0 or (amt > 0) == (delta > 0):
+                self._cancel(order, 'EXPIRED')
+                return
+            delta = math.copysign(min(abs(delta), abs(amt)), delta)
+            order['qty'] = abs(delta)
+
+        lev = self.leverage.get(key, DEFAULT_LEVERAGE)
+        realized = 0.0
+        closing = 0.0
+        if amt and (amt > 0) != (delta > 0):
+            closing = min(abs(delta), abs(amt))
+            realized = closing * (price - pos['entry']) * (1 if amt > 0 else -1)
+            pos['margin'] -= pos['margin'] * closing / abs(amt)
+            amt += math.copysign(closing, delta)
+        opening = abs(delta) - closing
+        if opening > 0:
+            if amt == 0:
+                pos['entry'] = price
+            else:
+                pos['entry'] = (pos['entry'] * abs(amt) + price * opening) / (abs(amt) + opening)
+            pos['margin'] += opening * price / lev
+            amt += math.copysign(opening, delta)
+        if abs(amt) < 1e-12:
+            amt, pos['entry'], pos['margin'] = 0.0, 0.0, 0.0
+        pos['amt'] = amt
+
+        fee = order['qty'] * price * self.fee_rate
+        self.wallet += realized - fee
+        self.realized += realized
+        self.fees += fee
+        self.stats['fills'] += 1
+        order['status'] = 'FILLED'
+        self.orders.pop(order['orderId'], None)
+        self._order_event(order, 'TRADE', price, fee, realized)
+        self._account_event(key)
+
+        if amt == 0:
+            # Reduce-only orders go away with the position
+            for other in [o for o in self.orders.values() if o['key'] == key and o['close_only']]:
+                self._cancel(other, 'CANCELED')
+
+    def _cancel(self, order, status='CANCELED'):
+        order['status'] = status
+        self.orders.pop(order['orderId'], None)
+        self.stats['cancels'] += 1
+        self._order_event(order, 'CANCELED' if status == 'CANCELED' else 'EXPIRED')
+
+    # === MATCHING ===
+    def _match(self, key):
+        price = self.prices[key]
+        orders = [o for o in self.orders.values() if o['key'] == key]
+        # Entries first so a bracket can trigger on the same tick its position opens
+        for order in sorted(orders, key=lambda o: o['type'] in CONDITIONAL_TYPES):
+            if order['orderId'] not in self.orders:
+                continue
+            fill = self._triggered(order, price)
+            if fill is not None:
+                self._fill(order, fill)
+
+    def _triggered(self, order, price):
+        """Fill price when `order` executes at this tick, else None."""
+        buy = order['side'] == 'BUY'
+        kind = order['type']
+        if kind == 'LIMIT':
+            if (buy and price <= order['price']) or (not buy and price >= order['price']):
+                return order['price'] if order['rested'] else price
+            order['rested'] = True
+            return None
+        if kind == 'MARKET':
+            return price
+
+        if order['close_only']:
+            amt = (self.positions.get(order['key']) or {}).get('amt', 0.0)
+            if amt == 0 or (amt > 0) == buy:
+                order['best'] = None      # nothing to close yet
+                return None
+        stop = order['stopPrice']
+        if kind == 'TAKE_PROFIT_MARKET':
+            hit = price <= stop if buy else price >= stop
+        elif kind == 'STOP_MARKET':
+            hit = price >= stop if buy else price <= stop
+        else:
+            best = order['best']
+            if best is None:
+                best = price
+            best = min(best, price) if buy else max(best, price)
+            order['best'] = best
+            cb = order['callbackRate'] / 100
+            hit = price >= best * (1 + cb) if buy else price <= best * (1 - cb)
+        return price if hit else None
+
+    # === ENDPOINTS ===
+    async def request(self, method, path, query):
+        """Answer one signed request; returns (status, body text, Retry-After) like the HTTP path."""
+        self.stats['requests'] += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        fault = self._fault(path)
+        if fault:
+            self.stats['faults'] += 1
+            return fault['status'], json.dumps({'code': fault['code'], 'msg': fault['msg']}), fault['retry_after']
+
+        params = {}
+        for part in query.split('&'):
+            if '=' in part:
+                k, v = part.split('=', 1)
+                params[k] = unquote(v)
+        handler = self._routes.get((method, path))
+        if handler is None:
+            result = {'code': API_NOT_EXIST, 'msg': f'api not exist: {method} {path}'}
+        else:
+            try:
+                result = handler(self, params)
+            except (KeyError, ValueError) as e:
+                result = {'code': INVALID_PARAMS, 'msg': f'invalid parameter: {e}'}
+        if result.get('code'):
+            self.stats['rejects'] += 1
+        return 200, json.dumps(result), None
+
+    def _ok(self, data=None):
+        return {'code': 0, 'msg': '', 'data': data if data is not None else {}}
+
+    def _server_time(self, params):
+        return self._ok({'serverTime': int(time.time() * 1000)})
+
+    def _contracts(self, params):
+        return self._ok(list(self.contracts.values()))
+
+    def _prices(self, params):
+        now = int(time.time() * 1000)
+        wanted = _key(params['symbol']) if params.get('symbol') else None
+        data = [{'symbol': _bingx(key), 'price': _num(price), 'time': now}
+                for key, price in self.prices.items() if not wanted or key == wanted]
+        return self._ok(data[0] if wanted and data else data)
+
+    def _balance(self, params):
+        return self._ok({'balance': {
+            'asset': 'USDT', 'balance': _num(self.wallet), 'equity': _num(self.equity()),
+            'unrealizedProfit': _num(self.equity() - self.wallet), 'realisedProfit': _num(self.realized),
+            'availableMargin': _num(self.available()), 'usedMargin': _num(self.used_margin()),
+        }})
+
+    def _position(self, params):
+        wanted = _key(params['symbol']) if params.get('symbol') else None
+        data = []
+        for key, pos in self.positions.items():
+            if not pos['amt'] or (wanted and key != wanted):
+                continue
+            data.append({
+                'symbol': _bingx(key), 'positionSide': 'LONG' if pos['amt'] > 0 else 'SHORT',
+                'positionAmt': _num(abs(pos['amt'])), 'avgPrice': _num(pos['entry']),
+                'leverage': self.leverage.get(key, DEFAULT_LEVERAGE), 'isolated': True,
+                'isolatedMargin': _num(pos['margin']), 'unrealizedProfit': _num(self._unrealized(key)),
+            })
+        return self._ok(data)
+
+    def _set_leverage(self, params):
+        key = _key(params['symbol'])
+        self.leverage[key] = int(params['leverage'])
+        return self._ok({'leverage': self.leverage[key], 'symbol': _bingx(key)})
+
+    def _set_margin_type(self, params):
+        return self._ok()
+
+    def _place_order(self, params):
+        key = _key(params['symbol'])
+        kind = params['type']
+        side = params['side']
+        qty = float(params['quantity'])
+        if side not in ('BUY', 'SELL') or kind not in ('LIMIT', 'MARKET') + CONDITIONAL_TYPES or qty <= 0:
+            return {'code': INVALID_PARAMS, 'msg': f'invalid order: {side} {kind} {qty}'}
+        if key not in self.contracts:
+            self.add_symbol(key, float(params.get('price') or params.get('stopPrice') or 0) or None)
+        if key not in self.prices:
+            # No feed for this symbol yet: start it at the order's own price
+            seed = float(params.get('price') or params.get('stopPrice') or 0)
+            if not seed:
+                return {'code': INVALID_PARAMS, 'msg': f'no price for {key}'}
+            self.prices[key] = seed
+
+        order = {
+            'orderId': self._next_id, 'key': key, 'side': side, 'type': kind, 'qty': qty,
+            'price': float(params.get('price') or 0), 'stopPrice': float(params.get('stopPrice') or 0),
+            'callbackRate': float(params.get('callbackRate') or 0), 'status': 'NEW',
+            'close_only': params.get('reduceOnly') == 'true',
+            'rested': False, 'best': None, 'clientOrderId': params.get('clientOrderID', ''),
+        }
+        if kind == 'LIMIT' and not order['price']:
+            return {'code': INVALID_PARAMS, 'msg': 'price required for LIMIT'}
+        if kind == 'TRAILING_STOP_MARKET' and not order['callbackRate']:
+            return {'code': INVALID_PARAMS, 'msg': 'callbackRate required'}
+        if not order['close_only'] and kind not in CONDITIONAL_TYPES:
+            # Conditional orders are margined when they trigger, not while they wait
+            ref = order['price'] or self.prices[key]
+            need = qty * ref / self.leverage.get(key, DEFAULT_LEVERAGE) + qty * ref * self.fee_rate
+            if need > self.available():
+                return {'code': INSUFFICIENT_MARGIN, 'msg': f'Insufficient margin: need {need:.4f}, available {self.available():.4f}'}
+
+        self._next_id += 1
+        self.stats['orders'] += 1
+        self.orders[order['orderId']] = order
+        self._order_event(order, 'NEW')
+        self._match(key)
+        return self._ok({'order': self._order_view(order)})
+
+    def _cancel_order(self, params):
+        order = self.orders.get(int(params['orderId']))
+        if order is None:
+            return {'code': ORDER_NOT_EXIST, 'msg': 'order not exist'}
+        self._cancel(order)
+        return self._ok({'order': self._order_view(order)})
+
+    def _query_order(self, params):
+        order = self.orders.get(int(params['orderId']))
+        if order is None:
+            return {'code': ORDER_NOT_EXIST, 'msg': 'order not exist'}
+        return self._ok({'order': self._order_view(order)})
+
+    def _open_orders(self, params):
+        wanted = _key(params['symbol']) if params.get('symbol') else None
+        return self._ok({'orders': [self._order_view(o) for o in self.orders.values()
+                                    if not wanted or o['key'] == wanted]})
+
+    def _order_view(self, order):
+        return {
+            'symbol': _bingx(order['key']), 'orderId': order['orderId'], 'clientOrderId': order['clientOrderId'], 'side': order['side'],
+            'positionSide': 'BOTH', 'type': order['type'], 'origQty': _num(order['qty']),
+            'price': _num(order['price']), 'stopPrice': _num(order['stopPrice']), 'status': order['status'],
+        }
+
+    def _listen_key(self, params):
+        return {'listenKey': 'sim-listen-key'}
+
+    _routes = {
+        ('GET', '/openApi/swap/v2/server/time'): _server_time,
+        ('GET', '/openApi/swap/v2/quote/contracts'): _contracts,
+        ('GET', '/openApi/swap/v2/quote/price'): _prices,
+        ('GET', '/openApi/swap/v2/user/balance'): _balance,
+        ('GET', '/openApi/swap/v2/trade/position'): _position,
+        ('POST', '/openApi/swap/v2/trade/leverage'): _set_leverage,
+        ('POST', '/openApi/swap/v2/trade/marginType'): _set_margin_type,
+        ('POST', '/openApi/swap/v2/trade/order'): _place_order,
+        ('DELETE', '/openApi/swap/v2/trade/order'): _cancel_order,
+        ('GET', '/openApi/swap/v2/trade/order'): _query_order,
+        ('GET', '/openApi/swap/v2/trade/openOrders'): _open_orders,
+        ('POST', '/openApi/user/auth/userDataStream'): _listen_key,
+        ('PUT', '/openApi/user/auth/userDataStream'): _listen_key,
+        ('DELETE', '/openApi/user/auth/userDataStream'): _listen_key,
+    }
+
+# === OFFLINE LOAD TEST ===
+async def _main():
+    import argparse
+    from api import use_simulator
+    from account import AccountState
+    from backtest import load_signals, SIGNALS_FILE
+    from config import get_config
+    from contracts import load_contracts
+    from klines import get_store
+    from metrics import record, format_summary
+    from logs import setup_logging
+    from ratelimit import RATE_LIMITS
+    from tp_monitor import TPMonitor
+    from trade import execute_trade, ORDER_PATH
+
+    ap = argparse.ArgumentParser(description="Run exported signals through execute_trade against the simulator")
+    ap.add_argument('--signals', default=SIGNALS_FILE)
+    ap.add_argument('--count', type=int, default=0, help='0 = all signals')
+    ap.add_argument('--concurrency', type=int, default=20)
+    ap.add_argument('--balance', type=float, default=10_000.0)
+    ap.add_argument('--usdt', type=float, default=50.0, help='margin per trade')
+    ap.add_argument('--latency', type=float, default=0.0)
+    ap.add_argument('--jitter', type=float, default=0.0)
+    ap.add_argument('--error-rate', type=float, default=0.0, help='share of order requests rejected')
+    ap.add_argument('--replay-hours', type=float, default=0.0, help='replay stored klines after each signal')
+    ap.add_argument('--interval', default='1m')
+    ap.add_argument('--unthrottled', action='store_true', help='lift the client-side rate limits')
+    ap.add_argument('--log-level', default='WARNING')
+    args = ap.parse_args()
+    setup_logging(args.log_level, path=None)
+    if args.unthrottled:
+        for group in RATE_LIMITS:
+            RATE_LIMITS[group] = (1e6, 1_000_000)
+
+    config = get_config()
+    signals = load_signals(args.signals)
+    if args.count:
+        signals = signals[:args.count]
+    sim = SimExchange(balance=args.balance, latency=args.latency, jitter=args.jitter, seed=1)
+    for s in signals:
+        sim.add_symbol(s['symbol'], price=s['entry'])
+    if args.error_rate:
+        sim.inject(100500, 'simulated internal error', path=ORDER_PATH, times=None, probability=args.error_rate)
+    use_simulator(sim)
+
+    client = {'api_key': 'sim', 'secret_key': 'sim'}
+    account = AccountState(client)
+    tp_monitor = TPMonitor(client, activate_after_tp=config['trailing_activate_after_tp'])
+    account.order_listeners.append(tp_monitor.on_order_update)
+    await load_contracts(client)
+    await account.start()
+
+    sem = asyncio.Semaphore(args.concurrency)
+    elapsed = []
+
+    async def _trade(signal):
+        async with sem:
+            signal['received_at'] = time.perf_counter()
+            sim.set_price(signal['symbol'], signal['entry'])
+            outcome = await execute_trade(client, signal, args.usdt, leverage=min(signal['leverage'], 10), config=config)
+            if outcome:
+                elapsed.append(outcome['elapsed'])
+                tp_monitor.track(outcome)
+                record('signal_to_entry_ack', outcome['entry']['acked_at'] - signal['received_at'])
+            return outcome
+
+    started = time.monotonic()
+    outcomes = await asyncio.gather(*(_trade(s) for s in signals))
+    wall = time.monotonic() - started
+
+    if args.replay_hours:
+        store = get_store()
+        span = int(args.replay_hours * 3_600_000)
+        for s in signals:
+            await sim.replay(s['symbol'], store.slice(s['symbol'], args.interval, s['ts'], s['ts'] + span))
+            await asyncio.sleep(0)   # let the account stream and TP monitor catch up
+
+    await asyncio.sleep(0.1)
+    await account.stop()
+    done = [o for o in outcomes if o]
+    elapsed.sort()
+    pct = lambda q: elapsed[min(len(elapsed) - 1, int(q * len(elapsed)))] * 1000 if elapsed else 0.0
+    print(f"\nSIMULATION: {len(signals)} signals in {wall:.2f}s ({len(signals) / wall:.1f}/s)")
+    print(f"  complete brackets : {sum(o['ok'] for o in done)}/{len(done)}  (protected {sum(o['protected'] for o in done)})")
+    print(f"  trade latency     : p50 {pct(0.5):.1f}ms  p99 {pct(0.99):.1f}ms  max {pct(1.0):.1f}ms")
+    print(f"  exchange          : {sim.stats}")
+    print(f"  open positions    : {sum(1 for p in sim.positions.values() if p['amt'])}  tracked brackets: {len(tp_monitor.brackets)}")
+    print(f"  wallet            : {sim.wallet:,.2f} USDT (realized {sim.realized:+,.2f}, fees {sim.fees:,.2f}, equity {sim.equity():,.2f})")
+    print(f"\n{format_summary()}")
+
+if __name__ == '__main__':
+    asyncio.run(_main())
@@ -0,0 +1,136 @@
+# sweep.py – PARALLEL PARAMETER SWEEP OVER STRATEGY CONFIGS (backtest.py on every core)
+#
+#   python sweep.py --grid tp1_close_percent=25,35,45 --grid trailing_callback_rate=0.8,1.3,2 \
+#                   --grid cap_stop_loss=true --grid stop_loss_percent=1,1.8,3 --grid max_open_positions=5,10,14
+#   python sweep.py --random 5000 --range trailing_callback_rate=0.5:3 --grid cap_stop_loss=true --range stop_loss_percent=0.5:4
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+import backtest
+from config import load_config
+
+RESULTS_FILE = 'sweep_results.jsonl'
+RANKED_FILE = 'sweep_ranked.jsonl'
+TP_KEYS = ['tp1_close_percent', 'tp2_close_percent', 'tp3_close_percent', 'tp4_close_percent']
+RANK_KEYS = ['avg_return', 'total_return', 'win_rate', 'trades', 'max_drawdown']
+RISK_KEYS = ['cap_stop_loss', 'stop_loss_percent', 'trailing_activate_after_tp', 'trailing_callback_rate', 'max_open_positions']
+
+_bt = None   # built once; inherited read-only by forked workers
+
+def _init_worker(build_args):
+    global _bt
+    if _bt is None:
+        _bt = backtest.build(**build_args)
+
+def _run_chunk(configs):
+    results = []
+    for cfg in configs:
+        summary = _bt.run(cfg)['summary']
+        results.append({'params': cfg['_params'], **summary})
+    return results
+
+def _parse_value(text):
+    if text in ('true', 'false'):
+        return text == 'true'
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def grid_configs(grid):
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+def random_configs(grid, ranges, count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        params = {k: rng.choice(v) for k, v in grid.items()}
+        for k, (lo, hi) in ranges.items():
+            params[k] = round(rng.uniform(lo, hi), 4)
+        yield params
+
+def make_configs(base, params_iter):
+    """Full configs (base + overrides); TP splits over 100% are dropped."""
+    for params in params_iter:
+        cfg = dict(base)
+        cfg.update(params)
+        if sum(cfg[k] for k in TP_KEYS) > 100 + 1e-9:
+            continue
+        cfg['_params'] = params
+        yield cfg
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--grid', action='append', default=[], metavar='KEY=V1,V2,...')
+    ap.add_argument('--range', action='append', default=[], metavar='KEY=LO:HI', help='sampled uniformly (random mode)')
+    ap.add_argument('--random', type=int, default=0, metavar='N', help='random search with N samples instead of the full grid')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--rank-by', default='avg_return', choices=RANK_KEYS,
+                    help='avg_return is per trade on margin; total_return compounds usdt_per_trade_percent of equity')
+    ap.add_argument('--workers', type=int, default=os.cpu_count())
+    ap.add_argument('--chunk', type=int, default=64)
+    ap.add_argument('--signals', default=backtest.SIGNALS_FILE)
+    ap.add_argument('--interval', default='1m')
+    ap.add_argument('--horizon-hours', type=float, default=72)
+    ap.add_argument('--output', default=RESULTS_FILE)
+    ap.add_argument('--ranked', default=RANKED_FILE)
+    args = ap.parse_args()
+
+    grid = {}
+    for spec in args.grid:
+        key, values = spec.split('=', 1)
+        grid[key] = [_parse_value(v) for v in values.split(',')]
+    ranges = {}
+    for spec in args.range:
+        key, bounds = spec.split('=', 1)
+        lo, hi = bounds.split(':')
+        ranges[key] = (float(lo), float(hi))
+
+    base = load_config()
+    if args.random:
+        params = random_configs(grid, ranges, args.random, args.seed)
+    else:
+        params = grid_configs(grid)
+    # Same risk settings next to each other so each worker reuses its cached stop arrays
+    configs = sorted(make_configs(base, params), key=lambda c: tuple(c.get(k, 0) for k in RISK_KEYS))
+    chunks = [configs[i:i + args.chunk] for i in range(0, len(configs), args.chunk)]
+
+    build_args = {'signals_path': args.signals, 'interval': args.interval, 'horizon_hours': args.horizon_hours}
+    started = time.monotonic()
+    global _bt
+    methods = mp.get_all_start_methods()
+    if 'fork' in methods:
+        # Build once here; forked workers share the arrays and memory maps copy-on-write
+        _bt = backtest.build(**build_args)
+        ctx = mp.get_context('fork')
+    else:
+        ctx = mp.get_context()
+    print(f"Sweeping {len(configs)} configs over {args.workers} workers ({len(chunks)} chunks)")
+
+    results = []
+    with open(args.output, 'w', encoding='utf-8') as out, \
+            ctx.Pool(args.workers, initializer=_init_worker, initargs=(build_args,)) as pool:
+        for done, chunk in enumerate(pool.imap_unordered(_run_chunk, chunks), 1):
+            for r in chunk:
+                out.write(json.dumps(r) + '\n')
+            out.flush()
+            results.extend(chunk)
+            print(f"  {done}/{len(chunks)} chunks – {len(results)} results", end='\r')
+
+    results.sort(key=lambda r: r[args.rank_by], reverse=args.rank_by != 'max_drawdown')
+    with open(args.ranked, 'w', encoding='utf-8') as f:
+        for rank, r in enumerate(results, 1):
+            f.write(json.dumps({'rank': rank, **r}) + '\n')
+
+    print(f"\nDone in {time.monotonic() - started:.1f}s – ranked by {args.rank_by} in {args.ranked}")
+    for r in results[:5]:
+        # total_return moves in the 1e-5 range at the default 0.0008% of equity per trade
+        print(f"  {r[args.rank_by]:+.6g}  {r['params']}")
+
+if __name__ == '__main__':
+    main()
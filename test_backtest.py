@@ -0,0 +1,39 @@
+# test_backtest.py – VECTORISED BACKTEST AGAINST THE LIVE ORDER RULES (pytest)
+import random
+import numpy as np
+import pytest
+from backtest import Backtest
+from klines import KLINE_DTYPE
+from trade import capped_stop
+
+def _signals(count, seed=1):
+    rng = random.Random(seed)
+    signals = []
+    for i in range(count):
+        direction = rng.choice(['LONG', 'SHORT'])
+        entry = rng.uniform(0.01, 50_000)
+        away = entry * rng.uniform(0.001, 0.1)
+        stop = entry - away if direction == 'LONG' else entry + away
+        step = entry * 0.01 * (1 if direction == 'LONG' else -1)
+        signals.append({'symbol': f'S{i}/USDT', 'direction': direction, 'entry': entry, 'stoploss': stop,
+                        'targets': [entry + step * k for k in range(1, 5)], 'leverage': 10, 'ts': 0})
+    return signals
+
+def _klines(signals, bars=5):
+    klines = {}
+    for i, s in enumerate(signals):
+        candles = np.zeros(bars, dtype=KLINE_DTYPE)
+        candles['ts'] = np.arange(1, bars + 1) * 60_000
+        for field in ('open', 'high', 'low', 'close'):
+            candles[field] = s['entry']
+        klines[f'S{i}USDT'] = candles
+    return klines
+
+@pytest.mark.parametrize('percent', [0, 0.5, 1.8, 5])
+def test_stop_prices_match_the_live_capped_stop(percent):
+    signals = _signals(500)
+    bt = Backtest(signals, _klines(signals), horizon_bars=5)
+    expected = [(1 if s['direction'] == 'LONG' else -1) * capped_stop(s['direction'], s['entry'], s['stoploss'], percent)
+                for s in bt.signals]
+    assert len(bt.signals) == 500
+    assert np.allclose(bt.stop_prices(percent), expected, rtol=1e-12, atol=0)
@@ -0,0 +1,91 @@
+# test_config.py – CONFIG VALIDATION AND HOT RELOAD (pytest)
+import json
+import os
+import pytest
+import config
+from config import DEFAULT_CONFIG, ConfigError, validate, get_config
+
+def _errors(**overrides):
+    try:
+        validate(dict(DEFAULT_CONFIG, **overrides))
+    except ConfigError as e:
+        return str(e)
+    return None
+
+def test_defaults_are_valid():
+    assert _errors() is None
+
+@pytest.mark.parametrize('key, value, message', [
+    ('max_open_positions', '14', 'max_open_positions must be int'),
+    ('max_open_positions', 14.0, 'max_open_positions must be int'),
+    ('metrics_port', True, 'metrics_port must be int'),
+    ('dry_run_mode', 1, 'dry_run_mode must be bool'),
+    ('log_level', None, 'log_level must be str'),
+    ('stop_loss_percent', -1, 'stop_loss_percent must not be negative'),
+    ('signal_source', 'discord', 'signal_source must be one of file, telegram'),
+    ('bracket_mode', 'batched', 'bracket_mode must be one of concurrent, serial'),
+])
+def test_type_and_choice_errors(key, value, message):
+    assert message in _errors(**{key: value})
+
+def test_ints_are_accepted_for_floats():
+    assert _errors(stop_loss_percent=2, dry_run_balance=5000) is None
+
+def test_tp_percents_over_100_are_rejected():
+    assert 'add up to 110' in _errors(tp1_close_percent=45.0)
+    assert _errors(tp1_close_percent=25.0) is None
+
+@pytest.mark.parametrize('value', [0, 5])
+def test_trailing_activation_must_be_a_tp(value):
+    assert 'trailing_activate_after_tp must be 1–4' in _errors(trailing_activate_after_tp=value)
+
+def test_interval_and_port_bounds():
+    assert 'check_interval_seconds must be at least 1' in _errors(check_interval_seconds=0)
+    assert 'metrics_interval_seconds must be at least 1' in _errors(metrics_interval_seconds=0)
+    assert 'metrics_port must be 0 (off) or 1–65535' in _errors(metrics_port=70000)
+    assert _errors(metrics_port=0) is None
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / 'bot_config.json'
+    monkeypatch.setattr(config, 'CONFIG_FILE', str(path))
+    monkeypatch.setattr(config, 'STAT_INTERVAL', 0.0)
+    monkeypatch.setattr(config, '_snapshot', None)
+    monkeypatch.setattr(config, '_stamp', None)
+
+    def write(values):
+        path.write_text(values if isinstance(values, str) else json.dumps(values))
+        # Make the change visible to the (mtime, size) check even within one clock tick
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    return write
+
+def test_changed_file_is_picked_up(config_file):
+    config_file({'max_open_positions': 5})
+    first = get_config()
+    assert first['max_open_positions'] == 5
+    assert get_config() is first            # unchanged file → same snapshot
+
+    config_file({'max_open_positions': 7})
+    second = get_config()
+    assert second is not first
+    assert second['max_open_positions'] == 7 and first['max_open_positions'] == 5
+    with pytest.raises(TypeError):
+        second['max_open_positions'] = 1     # read-only snapshot
+
+def test_invalid_reload_keeps_the_previous_snapshot(config_file):
+    config_file({'max_open_positions': 5})
+    good = get_config()
+    config_file({'max_open_positions': 0})
+    assert get_config() is good
+    config_file('{"max_open_positions": ')
+    assert get_config() is good
+    config_file('[1, 2]')
+    assert get_config() is good
+    config_file({'max_open_positions': 9})
+    assert get_config()['max_open_positions'] == 9
+
+def test_invalid_file_at_startup_raises(config_file):
+    config_file({'metrics_port': 9108.5})
+    with pytest.raises(ConfigError):
+        get_config()
@@ -0,0 +1,40 @@
+# test_contracts.py – ORDER QUANTISATION AGAINST CONTRACT SPECS (pytest)
+from decimal import Decimal
+import pytest
+import contracts
+from contracts import _parse_contract, get_contract, quantize_qty, quantize_price, check_order
+
+@pytest.fixture(autouse=True)
+def specs(monkeypatch):
+    raw = [{'symbol': 'BTC-USDT', 'pricePrecision': 1, 'quantityPrecision': 3, 'tradeMinQuantity': 0.002, 'tradeMinUSDT': 5},
+           {'symbol': 'TNSR-USDT', 'pricePrecision': 5, 'quantityPrecision': 0, 'tradeMinQuantity': 1, 'tradeMinUSDT': 2}]
+    monkeypatch.setattr(contracts, '_index', {contracts._key(r['symbol']): _parse_contract(r) for r in raw})
+
+def test_every_symbol_spelling_finds_the_spec():
+    assert get_contract('BTC/USDT') is get_contract('BTC-USDT') is get_contract('btcusdt')
+    assert get_contract('BTC/USDT')['step_size'] == Decimal('0.001')
+    assert get_contract('BTC/USDT')['tick_size'] == Decimal('0.1')
+
+def test_quantity_rounds_down_to_the_step():
+    assert quantize_qty('BTCUSDT', 0.0129) == Decimal('0.012')
+    assert quantize_qty('BTCUSDT', 0.012) == Decimal('0.012')
+    assert quantize_qty('TNSRUSDT', 1270.99) == Decimal('1270')
+
+def test_price_rounds_half_up_to_the_tick():
+    assert quantize_price('BTCUSDT', 50000.05) == Decimal('50000.1')
+    assert quantize_price('BTCUSDT', 50000.04) == Decimal('50000.0')
+    assert quantize_price('TNSRUSDT', 0.078695) == Decimal('0.07870')
+    assert quantize_price('TNSRUSDT', 0.078694) == Decimal('0.07869')
+
+def test_orders_below_the_minimums_are_rejected():
+    assert check_order('BTCUSDT', Decimal('0.002'), Decimal('50000')) is None
+    assert 'below min 0.002' in check_order('BTCUSDT', Decimal('0.001'), Decimal('50000'))
+    assert 'notional' in check_order('BTCUSDT', Decimal('0.002'), Decimal('2000'))
+    assert check_order('BTCUSDT', Decimal('0'), Decimal('50000')) == "quantity rounds to zero"
+
+def test_missing_contract_falls_back_to_plain_rounding():
+    assert get_contract('NEWUSDT') is None
+    assert quantize_qty('NEWUSDT', 1.23456789) == Decimal('1.234567')
+    assert quantize_price('NEWUSDT', 0.123456789) == Decimal('0.123456789')
+    assert check_order('NEWUSDT', Decimal('0.000001'), Decimal('1')) is None
+    assert check_order('NEWUSDT', Decimal('0'), Decimal('1')) == "quantity rounds to zero"
@@ -0,0 +1,55 @@
+# test_dedup.py – DEDUP KEYS AND OUTCOMES ACROSS A RESTART (pytest)
+import time
+from dedup import DedupStore, signal_key, legacy_key
+from signal_file import SignalFileReader
+from test_signal_file import _block, _write
+
+def test_keys_survive_a_restart_until_the_window_ends(tmp_path):
+    path = str(tmp_path / 'traded.db')
+    store = DedupStore(path, window_hours=1)
+    store.add('a', message_id=1)
+    store.close()
+
+    store = DedupStore(path, window_hours=1)
+    assert 'a' in store and 'b' not in store and len(store) == 1
+    store._db.execute("UPDATE traded SET traded_at = ?", (time.time() - 2 * 3600,))
+    store._db.commit()
+    store.close()
+    assert 'a' not in DedupStore(path, window_hours=1)
+
+def test_signal_read_as_tail_is_known_after_a_restart(tmp_path):
+    path = tmp_path / 'messages.txt'
+    store_path = str(tmp_path / 'traded.db')
+    _write(path, _block('TNSR'))
+    [first] = SignalFileReader(str(path)).read_signals()     # the file's open tail
+    store = DedupStore(store_path)
+    store.add(signal_key(first['raw_text']), outcome='traded')
+    store.close()
+
+    # Restart: the same block is now followed by the next one and re-read from the start
+    _write(path, _block('ARB', 2))
+    again, second = SignalFileReader(str(path)).read_signals()
+    assert again['raw_text'] != first['raw_text']
+    store = DedupStore(store_path)
+    assert signal_key(again['raw_text']) in store
+    assert signal_key(second['raw_text']) not in store
+
+def test_keys_stored_before_normalisation_still_match(tmp_path):
+    raw = "PREMIUM SIGNAL\r\nTNSR/USDT SHORT\r\n\r\n"
+    store = DedupStore(str(tmp_path / 'traded.db'))
+    store.add(legacy_key(raw))
+    assert legacy_key(raw) in store and signal_key(raw) not in store
+    assert signal_key(raw) == signal_key("PREMIUM SIGNAL\nTNSR/USDT SHORT")
+
+def test_only_entries_count_towards_the_daily_limit(tmp_path):
+    store_path = str(tmp_path / 'traded.db')
+    store = DedupStore(store_path)
+    since = time.time() - 1
+    for key, outcome in (('a', 'traded'), ('b', 'skipped'), ('c', 'expired'), ('d', 'sending')):
+        store.add(key, outcome=outcome)
+    store.close()
+
+    store = DedupStore(store_path)
+    assert len(store) == 4
+    assert store.count_since(since) == 1
+    assert store.count_since(since, ('traded', 'sending')) == 2
@@ -0,0 +1,167 @@
+# test_journal.py – RECONCILE AFTER A CRASH, AGAINST THE SIMULATOR (pytest)
+import asyncio
+import pytest
+import ratelimit
+import trade
+from api import use_simulator
+from config import DEFAULT_CONFIG
+from journal import OrderJournal, reconcile, CLOSED, PLACED
+from simulator import SimExchange
+from tp_monitor import TPMonitor
+
+CLIENT = {'name': 'main', 'api_key': 'k', 'secret_key': 's'}
+SIGNAL = {'symbol': 'BTC/USDT', 'direction': 'LONG', 'entry': 50000, 'targets': [50500, 51000, 51500, 52000],
+          'stoploss': 49500, 'leverage': 10}
+
+class Crash(Exception):
+    pass
+
+@pytest.fixture
+def sim(monkeypatch):
+    # Buckets hold timers of the event loop they last ran in; every asyncio.run gets fresh ones
+    monkeypatch.setattr(ratelimit, '_buckets', {})
+    sim = SimExchange(balance=100_000, seed=1)
+    sim.add_symbol('BTCUSDT', 50000)
+    use_simulator(sim)
+    yield sim
+    use_simulator(None)
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / 'journal.db')
+
+def _open(sim):
+    return sorted((o['type'], o['qty']) for o in sim.orders.values())
+
+def _restart(journal, db, tp_monitor=None):
+    journal.close()
+    journal = OrderJournal(db)
+    return journal, asyncio.run(reconcile(CLIENT, journal, tp_monitor))
+
+def test_crash_before_entry_is_sent_closes_the_trade(sim, db, monkeypatch):
+    async def crash(*args):
+        raise Crash
+    monkeypatch.setattr(trade, 'place_order', crash)
+    journal = OrderJournal(db)
+    with pytest.raises(Crash):
+        asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    monkeypatch.undo()
+
+    journal, placed = _restart(journal, db)
+    assert placed == 0
+    assert journal.open_trades('main') == []
+    assert sim.orders == {}
+
+def test_crash_before_entry_ack_adopts_the_resting_entry(sim, db):
+    sim.set_price('BTCUSDT', 50200)     # the LIMIT entry rests on the book
+    journal = OrderJournal(db)
+
+    def crash(*args, **kwargs):
+        raise Crash
+    journal.acks = crash
+    with pytest.raises(Crash):
+        asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    assert [o['type'] for o in sim.orders.values()] == ['LIMIT']
+
+    journal, placed = _restart(journal, db)
+    [entry] = [o for o in sim.orders.values() if o['type'] == 'LIMIT']
+    [recovered] = journal.open_trades('main')
+    assert recovered['legs']['ENTRY']['status'] == 'acked'
+    assert recovered['legs']['ENTRY']['order_id'] == str(entry['orderId'])
+    assert recovered['state'] == PLACED
+    assert placed == len(recovered['legs']) - 1
+    assert 'STOP_MARKET' in {o['type'] for o in sim.orders.values()}
+
+def test_crash_after_entry_ack_places_the_bracket_once(sim, db, monkeypatch):
+    async def crash(*args, **kwargs):
+        raise Crash
+    monkeypatch.setattr(trade, 'place_bracket', crash)
+    journal = OrderJournal(db)
+    with pytest.raises(Crash):
+        asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    monkeypatch.undo()
+    assert sim.positions['BTCUSDT']['amt'] > 0 and sim.orders == {}
+
+    journal, placed = _restart(journal, db)
+    assert placed == 5
+    assert [t for t, _ in _open(sim)] == ['STOP_MARKET'] + ['TAKE_PROFIT_MARKET'] * 4
+
+    journal, placed = _restart(journal, db)
+    assert placed == 0
+
+def test_missing_stop_is_rearmed_for_the_full_position(sim, db):
+    journal = OrderJournal(db)
+    asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    for order in [o for o in sim.orders.values() if o['type'] in ('STOP_MARKET', 'TRAILING_STOP_MARKET')]:
+        sim._cancel(order)
+
+    journal, placed = _restart(journal, db)
+    assert placed == 1
+    [stop] = [o for o in sim.orders.values() if o['type'] == 'STOP_MARKET']
+    assert stop['qty'] == pytest.approx(sim.positions['BTCUSDT']['amt'])
+
+def test_stopped_out_trade_is_closed(sim, db):
+    journal = OrderJournal(db)
+    asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    sim.set_price('BTCUSDT', 49000)
+    assert sim.positions['BTCUSDT']['amt'] == 0
+
+    journal, placed = _restart(journal, db)
+    assert placed == 0
+    assert journal.open_trades('main') == []
+    assert journal._db.execute("SELECT state FROM trades").fetchone() == (CLOSED,)
+
+def test_take_profits_filled_while_down_move_the_stop_to_breakeven(sim, db):
+    journal = OrderJournal(db)
+    asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    sim.set_price('BTCUSDT', 51100)     # TP1 and TP2 fill with nobody watching
+
+    monitor = TPMonitor(CLIENT, activate_after_tp=2)
+    journal, placed = _restart(journal, db, monitor)
+    bracket = monitor.brackets['BTCUSDT']
+    assert (bracket.tps_filled, bracket.breakeven) == (2, True)
+    [stop] = [o for o in sim.orders.values() if o['type'] == 'STOP_MARKET']
+    assert stop['stopPrice'] == 50000
+    assert stop['qty'] == pytest.approx(sim.positions['BTCUSDT']['amt'])
+
+    # A second restart adopts the breakeven stop instead of moving it again
+    monitor = TPMonitor(CLIENT, activate_after_tp=2)
+    journal, placed = _restart(journal, db, monitor)
+    assert monitor.brackets['BTCUSDT'].breakeven
+    assert monitor.brackets['BTCUSDT'].sl_order_id == str(stop['orderId'])
+
+def test_failed_startup_reconcile_is_retried_until_it_goes_through(sim, db, monkeypatch):
+    import fanout
+    from fanout import Fleet
+    async def crash(*args, **kwargs):
+        raise Crash
+    monkeypatch.setattr(trade, 'place_bracket', crash)
+    journal = OrderJournal(db)
+    with pytest.raises(Crash):
+        asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    monkeypatch.undo()
+    monkeypatch.setattr(fanout, 'backoff_delay', lambda attempt: 0.01)
+    sim.inject(100500, 'openOrders unavailable', path='/openApi/swap/v2/trade/openOrders', times=3)
+
+    async def run():
+        fleet = Fleet([CLIENT], dict(DEFAULT_CONFIG), journal=journal)
+        await fleet.start()
+        assert sim.orders == {}             # startup went on without it
+        for _ in range(500):
+            if sim.orders:
+                break
+            await asyncio.sleep(0.01)
+        await fleet.stop()
+    asyncio.run(run())
+    assert 'STOP_MARKET' in {o['type'] for o in sim.orders.values()}
+
+def test_a_retry_leaves_trades_opened_after_startup_alone(sim, db):
+    journal = OrderJournal(db)
+    asyncio.run(trade.execute_trade(CLIENT, SIGNAL, 100, 10, dict(DEFAULT_CONFIG), journal=journal))
+    for order in list(sim.orders.values()):
+        sim._cancel(order)
+    [opened] = journal.open_trades('main')
+
+    assert asyncio.run(reconcile(CLIENT, journal, before=opened['created_at'])) == 0
+    assert sim.orders == {}
+    assert asyncio.run(reconcile(CLIENT, journal)) > 0
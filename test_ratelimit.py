@@ -0,0 +1,51 @@
+# test_ratelimit.py – TOKEN BUCKET PRIORITY AND RATE-LIMIT PENALTY (pytest)
+import asyncio
+import time
+from ratelimit import TokenBucket, PRIORITY_STOP, PRIORITY_ENTRY, PRIORITY_ORDER, PRIORITY_HOUSEKEEPING, classify
+
+async def _drain_order(bucket, requests):
+    """Queue (label, priority) acquires on an empty bucket; return labels in release order."""
+    served = []
+
+    async def one(label, priority):
+        await bucket.acquire(priority)
+        served.append(label)
+    tasks = []
+    for label, priority in requests:
+        tasks.append(asyncio.create_task(one(label, priority)))
+        await asyncio.sleep(0)      # enqueue in this order
+    await asyncio.gather(*tasks)
+    return served
+
+def test_waiters_are_released_by_priority_then_fifo():
+    async def run():
+        bucket = TokenBucket(rate=200, burst=1)
+        await bucket.acquire()
+        return await _drain_order(bucket, [('status', PRIORITY_HOUSEKEEPING), ('tp1', PRIORITY_ORDER),
+                                           ('entry', PRIORITY_ENTRY), ('tp2', PRIORITY_ORDER),
+                                           ('stop', PRIORITY_STOP)])
+    assert asyncio.run(run()) == ['stop', 'entry', 'tp1', 'tp2', 'status']
+
+def test_burst_is_served_without_waiting():
+    async def run():
+        bucket = TokenBucket(rate=1, burst=5)
+        started = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - started
+    assert asyncio.run(run()) < 0.05
+
+def test_penalize_pauses_the_group():
+    async def run():
+        bucket = TokenBucket(rate=100, burst=10)
+        bucket.penalize(0.2)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+    assert 0.2 <= asyncio.run(run()) < 0.4
+
+def test_protective_orders_get_the_stop_priority():
+    assert classify('POST', '/openApi/swap/v2/trade/order', {'type': 'STOP_MARKET'}) == ('order', PRIORITY_STOP)
+    assert classify('POST', '/openApi/swap/v2/trade/order', {'type': 'LIMIT'}) == ('order', PRIORITY_ENTRY)
+    assert classify('POST', '/openApi/swap/v2/trade/order', {'type': 'TAKE_PROFIT_MARKET'}) == ('order', PRIORITY_ORDER)
+    assert classify('GET', '/openApi/swap/v2/quote/price')[0] == 'market'
@@ -0,0 +1,60 @@
+# test_scheduler.py – SignalScheduler.admit EXPIRY AND RANKING (pytest)
+import time
+from config import DEFAULT_CONFIG
+from scheduler import SignalScheduler
+
+def _signal(symbol='BTC/USDT', direction='LONG', entry=100.0, leverage=10, **extra):
+    long = direction == 'LONG'
+    signal = {'symbol': symbol, 'direction': direction, 'leverage': leverage,
+              'entry': entry, 'entry_min': entry * 0.99, 'entry_max': entry * 1.01,
+              'targets': [entry * (1.05 if long else 0.95)], 'stoploss': entry * (0.95 if long else 1.05)}
+    signal.update(extra)
+    return signal
+
+def _scheduler(**overrides):
+    return SignalScheduler(dict(DEFAULT_CONFIG, **overrides))
+
+def test_stale_signals_expire():
+    sched = _scheduler(signal_max_age_minutes=10)
+    sched.push(_signal('A/USDT', received_at=time.perf_counter() - 11 * 60), 'old')
+    sched.push(_signal('B/USDT', posted_at=time.time() - 11 * 60), 'old-post')
+    sched.push(_signal('C/USDT', posted_at=time.time() - 60), 'fresh')
+    admitted, expired = sched.admit({}, slots=5)
+    assert sorted(key for _, key in expired) == ['old', 'old-post']
+    assert [key for _, key in admitted] == ['fresh']
+    assert len(sched) == 0
+
+def test_price_checks_expire_signals():
+    sched = _scheduler(entry_tolerance_percent=0.5)
+    sched.push(_signal('SL/USDT'), 'stop-hit')
+    sched.push(_signal('TP/USDT'), 'tp1-hit')
+    sched.push(_signal('RUN/USDT'), 'entry-passed')
+    sched.push(_signal('OK/USDT'), 'inside')
+    prices = {'SLUSDT': 94.0, 'TPUSDT': 106.0, 'RUNUSDT': 102.0, 'OKUSDT': 100.0}
+    admitted, expired = sched.admit(prices, slots=5)
+    assert sorted(key for _, key in expired) == ['entry-passed', 'stop-hit', 'tp1-hit']
+    assert [key for _, key in admitted] == ['inside']
+
+def test_ranking_prefers_fresh_close_and_low_leverage():
+    sched = _scheduler()
+    now = time.perf_counter()
+    sched.push(_signal('OLD/USDT', received_at=now - 30 * 60), 'older')
+    sched.push(_signal('FAR/USDT', received_at=now), 'away')
+    sched.push(_signal('HIGH/USDT', leverage=50, received_at=now), 'high-leverage')
+    sched.push(_signal('BEST/USDT', received_at=now), 'best')
+    prices = {'OLDUSDT': 100.0, 'FARUSDT': 98.5, 'HIGHUSDT': 100.0, 'BESTUSDT': 100.0}
+    admitted, _ = sched.admit(prices, slots=4)
+    assert [key for _, key in admitted] == ['best', 'high-leverage', 'away', 'older']
+
+def test_slots_limit_and_one_signal_per_symbol():
+    sched = _scheduler()
+    now = time.perf_counter()
+    sched.push(_signal('BTC/USDT', received_at=now), 'btc-1')
+    sched.push(_signal('BTC-USDT', received_at=now - 1), 'btc-2')
+    sched.push(_signal('ETH/USDT', received_at=now - 2), 'eth')
+    sched.push(_signal('SOL/USDT', received_at=now - 3), 'sol')
+    admitted, expired = sched.admit({}, slots=2)
+    assert expired == []
+    assert len(admitted) == 2
+    assert len({s['symbol'].replace('-', '/') for s, _ in admitted}) == 2
+    assert len(sched) == 2
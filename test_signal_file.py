@@ -0,0 +1,74 @@
+# test_signal_file.py – SignalFileReader TAILING, ROTATION AND TRUNCATION (pytest)
+import os
+from signal_file import SignalFileReader
+
+SIGNAL = """PREMIUM SIGNAL
+🔴{symbol}/USDT SHORT (sell)
+Margin: Cross, 20X
+ENTRY: <0.07831-0.07909>
+———
+🎯TARGETS:
+1. [0.07791] 2. [0.07713]
+3. [0.07634] 4. [0.07477]
+———
+❌STOPLOSS: [0.08657]"""
+
+def _block(symbol, message_id=1, timestamp='2025-01-31 12:00:00'):
+    # Same layout download_100_signals.py writes
+    return f"\n{'=' * 80}\n[{timestamp}] ID: {message_id}\n{SIGNAL.format(symbol=symbol)}\n\n"
+
+def _write(path, text, mode='a'):
+    with open(path, mode, encoding='utf-8') as f:
+        f.write(text)
+
+def _symbols(reader):
+    return [s['symbol'] for s in reader.read_signals()]
+
+def test_only_new_blocks_are_returned(tmp_path):
+    path = tmp_path / 'messages.txt'
+    _write(path, _block('TNSR') + _block('ARB', 2))
+    reader = SignalFileReader(str(path))
+    assert _symbols(reader) == ['TNSR/USDT', 'ARB/USDT']
+    assert _symbols(reader) == []
+    _write(path, _block('OP', 3))
+    assert _symbols(reader) == ['OP/USDT']
+
+def test_half_written_block_waits_for_the_rest(tmp_path):
+    path = tmp_path / 'messages.txt'
+    block = _block('TNSR')
+    cut = block.index('TARGETS')
+    _write(path, block[:cut])
+    reader = SignalFileReader(str(path))
+    assert _symbols(reader) == []
+    _write(path, block[cut:])
+    assert _symbols(reader) == ['TNSR/USDT']
+
+def test_header_sets_post_time_and_message_id(tmp_path):
+    path = tmp_path / 'messages.txt'
+    _write(path, _block('TNSR', 4242, '2025-01-31 12:00:00'))
+    [signal] = SignalFileReader(str(path)).read_signals()
+    assert signal['message_id'] == 4242
+    assert signal['posted_at'] == 1738324800.0
+
+def test_rotated_file_is_read_from_the_start(tmp_path):
+    path = tmp_path / 'messages.txt'
+    _write(path, _block('TNSR') + _block('ARB', 2))
+    reader = SignalFileReader(str(path))
+    assert len(_symbols(reader)) == 2
+
+    rotated = tmp_path / 'messages.new'
+    _write(rotated, _block('OP', 3))
+    os.replace(rotated, path)
+    assert _symbols(reader) == ['OP/USDT']
+
+def test_truncated_file_is_read_from_the_start(tmp_path):
+    path = tmp_path / 'messages.txt'
+    _write(path, _block('TNSR') + _block('ARB', 2))
+    reader = SignalFileReader(str(path))
+    assert len(_symbols(reader)) == 2
+
+    _write(path, _block('OP', 3), mode='w')
+    assert _symbols(reader) == ['OP/USDT']
+
+def test_missing_file_reads_nothing(tmp_path):
+    assert SignalFileReader(str(tmp_path / 'absent.txt')).read_signals() == []
@@ -0,0 +1,115 @@
+# test_trade.py – BRACKET CONSTRUCTION AND THE SYMBOL SETTINGS CACHE (pytest)
+import asyncio
+from decimal import Decimal
+import pytest
+import contracts
+import trade
+from config import DEFAULT_CONFIG
+from contracts import _parse_contract
+from trade import build_bracket, ensure_symbol_settings, refresh_symbol_settings
+
+@pytest.fixture(autouse=True)
+def specs(monkeypatch):
+    raw = {'symbol': 'BTC-USDT', 'pricePrecision': 1, 'quantityPrecision': 3, 'tradeMinQuantity': 0.002, 'tradeMinUSDT': 5}
+    monkeypatch.setattr(contracts, '_index', {'BTCUSDT': _parse_contract(raw)})
+
+TARGETS = [50500.04, 51000.05, 51500, 52000]
+
+def _config(*percents):
+    return dict(DEFAULT_CONFIG, **{f'tp{i}_close_percent': p for i, p in enumerate(percents, 1)})
+
+def _legs(qty, config, symbol='BTCUSDT'):
+    return dict(build_bracket(symbol, 'LONG', Decimal(qty), TARGETS, 49000.06, config))
+
+def test_tp_split_rounds_down_and_the_trailing_leg_takes_the_rest():
+    legs = _legs('0.020', _config(35, 30, 20, 15))
+    assert [legs[f'TP{i}']['quantity'] for i in range(1, 5)] == ['0.007', '0.006', '0.004', '0.003']
+    assert 'TRAILING' not in legs
+    legs = _legs('0.025', _config(35, 30, 20, 15))
+    # 0.00875 / 0.0075 / 0.005 / 0.00375 → 0.008 / 0.007 / 0.005 / 0.003, leaving 0.002
+    assert Decimal(legs['TRAILING']['quantity']) == Decimal('0.002')
+    assert legs['SL']['quantity'] == '0.025'
+
+def test_prices_are_rounded_to_the_tick():
+    legs = _legs('0.020', _config(35, 30, 20, 15))
+    assert [legs[f'TP{i}']['stopPrice'] for i in range(1, 5)] == ['50500.0', '51000.1', '51500.0', '52000.0']
+    assert legs['SL']['stopPrice'] == '49000.1'
+    assert all(leg['side'] == 'SELL' for leg in legs.values())
+
+def test_tps_below_min_qty_are_skipped_and_a_tiny_remainder_gets_no_trailing_leg():
+    legs = _legs('0.011', _config(40, 30, 15, 15))
+    # 0.0044 / 0.0033 / 0.00165 / 0.00165 → 0.004 / 0.003 / 0.001 / 0.001; the last two are under 0.002
+    assert [name for name in legs if name.startswith('TP')] == ['TP1', 'TP2']
+    assert Decimal(legs['TRAILING']['quantity']) == Decimal('0.004')
+    legs = _legs('0.011', _config(40, 30, 30, 0))
+    # 0.004 + 0.003 + 0.003 leaves 0.001, under min qty
+    assert 'TRAILING' not in legs
+    assert legs['SL']['quantity'] == '0.011'
+
+def test_missing_contract_keeps_prices_and_ignores_sub_percent_leftovers():
+    legs = _legs('1.000001', _config(35, 30, 20, 15), symbol='NEWUSDT')
+    assert [legs[f'TP{i}']['quantity'] for i in range(1, 5)] == ['0.350000', '0.300000', '0.200000', '0.150000']
+    assert 'TRAILING' not in legs
+    assert legs['TP1']['stopPrice'] == '50500.04'
+
+class FakeBingX:
+    """Records every call; answers with `errors[path tail]` when set, else success."""
+
+    def __init__(self):
+        self.calls = []
+        self.errors = {}
+
+    async def __call__(self, method, path, api_key, secret_key, data=None, params=None):
+        self.calls.append(path.rsplit('/', 1)[1])
+        code = self.errors.get(path.rsplit('/', 1)[1])
+        return {'code': code, 'msg': 'rejected'} if code else {'code': 0, 'data': {}}
+
+@pytest.fixture
+def bingx(monkeypatch):
+    fake = FakeBingX()
+    monkeypatch.setattr(trade, 'bingx_api_request', fake)
+    monkeypatch.setattr(trade, '_symbol_settings', {})
+    return fake
+
+A = {'name': 'a', 'api_key': 'key-a', 'secret_key': 's'}
+B = {'name': 'b', 'api_key': 'key-b', 'secret_key': 's'}
+
+def _settings(client, symbol='BTCUSDT', leverage=10):
+    return asyncio.run(ensure_symbol_settings(client, symbol, leverage))
+
+def test_confirmed_settings_are_not_sent_again(bingx):
+    assert _settings(A)
+    assert sorted(bingx.calls) == ['leverage', 'marginType']
+    bingx.calls.clear()
+    assert _settings(A)
+    assert bingx.calls == []
+    assert _settings(A, leverage=5)
+    assert bingx.calls == ['leverage']
+    bingx.calls.clear()
+    # Cached per API key and per symbol
+    _settings(B)
+    _settings(A, symbol='ETHUSDT')
+    assert sorted(bingx.calls) == ['leverage', 'leverage', 'marginType', 'marginType']
+
+def test_a_settings_error_clears_the_cache(bingx):
+    bingx.errors['leverage'] = 109400
+    assert not _settings(A)
+    bingx.errors.clear()
+    bingx.calls.clear()
+    assert _settings(A)
+    assert sorted(bingx.calls) == ['leverage', 'marginType']
+
+def test_refresh_forgets_one_symbol_or_account(bingx):
+    _settings(A)
+    _settings(A, symbol='ETHUSDT')
+    _settings(B)
+    refresh_symbol_settings(A, 'BTCUSDT')
+    bingx.calls.clear()
+    for client, symbol in ((A, 'BTCUSDT'), (A, 'ETHUSDT'), (B, 'BTCUSDT')):
+        _settings(client, symbol)
+    assert sorted(bingx.calls) == ['leverage', 'marginType']
+    refresh_symbol_settings()
+    bingx.calls.clear()
+    _settings(A)
+    _settings(B)
+    assert len(bingx.calls) == 4
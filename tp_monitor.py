@@ -0,0 +1,195 @@
+# tp_monitor.py – ONE MONITOR FOR ALL OPEN BRACKETS (breakeven stop after TP N)
+import time
+from decimal import Decimal
+from api import bingx_api_request
+from trade import place_order, ORDER_PATH
+from metrics import record
+from logs import get_logger
+
+log = get_logger('tp_monitor')
+
+class Bracket:
+    """Compact per-position state for one tracked bracket."""
+    __slots__ = ('symbol', 'direction', 'entry_price', 'qty', 'tp_orders', 'sl_order_id',
+                 'tps_filled', 'closed_qty', 'breakeven', 'opened', 'received_at')
+
+    def __init__(self, symbol, direction, entry_price, qty, tp_orders, sl_order_id):
+        self.symbol = symbol
+        self.direction = direction
+        self.entry_price = entry_price
+        self.qty = qty
+        self.tp_orders = tp_orders      # orderId → Decimal quantity
+        self.sl_order_id = sl_order_id
+        self.tps_filled = 0
+        self.closed_qty = Decimal(0)
+        self.breakeven = False
+        self.opened = False             # position seen open in the account snapshot
+        self.received_at = None         # perf_counter() when the signal arrived
+
+def _key(symbol):
+    return symbol.replace('/', '').replace('-', '').upper()
+
+class TPMonitor:
+    """Moves the stop loss to breakeven once `activate_after_tp` take-profits have filled.
+
+    Driven by ORDER_TRADE_UPDATE events from the account stream, so every open bracket is
+    watched at once with no per-position polling.
+    """
+
+    def __init__(self, client, activate_after_tp=2):
+        self.client = client
+        self.activate_after_tp = activate_after_tp
+        self.brackets = {}     # symbol → Bracket
+        self._orders = {}      # orderId → (symbol, leg)
+
+    def track(self, outcome):
+        """Start watching the bracket described by an execute_trade outcome."""
+        if not outcome or not outcome['entry']['ok']:
+            return
+        symbol = _key(outcome['symbol'])
+        self.untrack(symbol)
+        tp_orders = {}
+        sl_order_id = None
+        for leg in outcome['legs']:
+            if not leg['ok'] or leg['order_id'] is None:
+                continue
+            order_id = str(leg['order_id'])
+            if leg['leg'].startswith('TP'):
+                tp_orders[order_id] = Decimal(leg['payload']['quantity'])
+            elif leg['leg'] == 'SL':
+                sl_order_id = order_id
+            self._orders[order_id] = (symbol, leg['leg'])
+        if outcome['entry']['order_id'] is not None:
+            self._orders[str(outcome['entry']['order_id'])] = (symbol, 'ENTRY')
+
+        self.brackets[symbol] = Bracket(
+            symbol=outcome['symbol'],
+            direction=outcome['direction'],
+            entry_price=outcome['entry']['payload']['price'],
+            qty=Decimal(outcome['entry']['payload']['quantity']),
+            tp_orders=tp_orders,
+            sl_order_id=sl_order_id,
+        )
+        self.brackets[symbol].received_at = outcome.get('received_at')
+        log.info("Watching %s – %d TPs, breakeven after TP%d (%d open)", outcome['symbol'], len(tp_orders), self.activate_after_tp, len(self.brackets))
+
+    async def restore(self, trade, open_orders):
+        """Rebuild the bracket of a journaled trade after a restart (see journal.reconcile).
+
+        TP legs that are no longer on the book count as filled; when enough filled while the
+        bot was down, the stop is moved to breakeven straight away.
+        """
+        legs = trade['legs']
+        entry = legs.get('ENTRY')
+        if entry is None or entry['status'] != 'acked':
+            return
+        symbol = _key(trade['symbol'])
+        resting = {str(o.get('orderId')): o for o in open_orders if _key(o.get('symbol', '')) == symbol}
+        self.untrack(symbol)
+        qty = Decimal(entry['payload']['quantity'])
+        entry_price = entry['payload']['price']
+
+        tp_orders, tps_filled, closed_qty, live = {}, 0, Decimal(0), []
+        for name, leg in legs.items():
+            if leg['status'] != 'acked' or leg['order_id'] is None or leg['order_id'] not in resting:
+                if name.startswith('TP') and leg['status'] == 'acked':
+                    tps_filled += 1
+                    closed_qty += Decimal(leg['payload']['quantity'])
+                continue
+            if name.startswith('TP'):
+                tp_orders[leg['order_id']] = Decimal(leg['payload']['quantity'])
+            live.append((leg['order_id'], name))
+        if closed_qty >= qty:
+            return
+        for order_id, name in live:
+            self._orders[order_id] = (symbol, name)
+
+        sl_order_id = legs['SL']['order_id'] if 'SL' in legs and legs['SL']['order_id'] in resting else None
+        breakeven = False
+        if sl_order_id is None:
+            # A breakeven stop this monitor placed is not journaled – adopt it from the book
+            stop = next((o for o in resting.values() if o.get('type') == 'STOP_MARKET'), None)
+            if stop is not None:
+                sl_order_id = str(stop['orderId'])
+                self._orders[sl_order_id] = (symbol, 'SL')
+                breakeven = stop.get('stopPrice') is not None and Decimal(str(stop['stopPrice'])) == Decimal(entry_price)
+
+        bracket = Bracket(trade['symbol'], trade['direction'], entry_price, qty, tp_orders, sl_order_id)
+        bracket.tps_filled = tps_filled
+        bracket.closed_qty = closed_qty
+        bracket.breakeven = breakeven
+        self.brackets[symbol] = bracket
+        log.info("Restored %s – %d TPs filled, breakeven after TP%d", trade['symbol'], tps_filled, self.activate_after_tp)
+        if tps_filled >= self.activate_after_tp and not breakeven:
+            await self._move_stop_to_breakeven(bracket)
+
+    def untrack(self, symbol):
+        symbol = _key(symbol)
+        if self.brackets.pop(symbol, None):
+            for order_id in [o for o, ref in self._orders.items() if ref[0] == symbol]:
+                del self._orders[order_id]
+
+    def prune(self, open_symbols):
+        """Drop brackets whose position was open and is now gone (closed outside the monitor)."""
+        for symbol, bracket in list(self.brackets.items()):
+            if symbol in open_symbols:
+                bracket.opened = True
+            elif bracket.opened:
+                self.untrack(symbol)
+
+    async def on_order_update(self, order):
+        if order.get('X') != 'FILLED':
+            return
+        ref = self._orders.get(str(order.get('i')))
+        if ref is None:
+            return
+        symbol, leg = ref
+        bracket = self.brackets.get(symbol)
+        if bracket is None:
+            return
+
+        if leg == 'ENTRY':
+            if bracket.received_at:
+                record('signal_to_fill', time.perf_counter() - bracket.received_at)
+            self._orders.pop(str(order.get('i')), None)
+            return
+
+        if leg in ('SL', 'TRAILING'):
+            log.info("%s closed by %s", bracket.symbol, leg)
+            self.untrack(symbol)
+            return
+
+        if leg.startswith('TP'):
+            bracket.tps_filled += 1
+            bracket.closed_qty += bracket.tp_orders.get(str(order.get('i')), Decimal(0))
+            log.info("%s %s filled (%d TPs)", bracket.symbol, leg, bracket.tps_filled)
+            if bracket.closed_qty >= bracket.qty:
+                self.untrack(symbol)
+            elif bracket.tps_filled >= self.activate_after_tp and not bracket.breakeven:
+                await self._move_stop_to_breakeven(bracket)
+
+    async def _move_stop_to_breakeven(self, bracket):
+        remaining = bracket.qty - bracket.closed_qty
+        opposite = 'SELL' if bracket.direction == 'LONG' else 'BUY'
+        # New stop goes in before the old one is cancelled so the position is never unprotected
+        new_sl = await place_order(self.client, "SL", {
+            'symbol': bracket.symbol,
+            'side': opposite,
+            'type': 'STOP_MARKET',
+            'quantity': f"{remaining:f}",
+            'stopPrice': bracket.entry_price,
+            'workingType': 'MARK_PRICE',
+            'reduceOnly': 'false'
+        })
+        if not new_sl['ok']:
+            return
+
+        old_sl = bracket.sl_order_id
+        if old_sl:
+            await bingx_api_request('DELETE', ORDER_PATH, self.client['api_key'], self.client['secret_key'],
+                                    params={'symbol': bracket.symbol, 'orderId': old_sl})
+            self._orders.pop(old_sl, None)
+        bracket.sl_order_id = str(new_sl['order_id'])
+        self._orders[bracket.sl_order_id] = (_key(bracket.symbol), 'SL')
+        bracket.breakeven = True
+        log.info("%s stop moved to breakeven %s for %s", bracket.symbol, bracket.entry_price, remaining)
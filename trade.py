@@ -1,93 +1,251 @@
 # trade.py – FINAL – SYMBOLUSDT + NO positionSide ERROR
-from api import bingx_api_request
+import asyncio
+import time
+from decimal import Decimal
+from api import bingx_api_request, get_simulator
+from metrics import record
+from logs import get_logger
+from contracts import ensure_contracts, get_contract, quantize_qty, quantize_price, check_order
+from marketdata import pre_trade_problem
 
-async def execute_trade(client, signal, usdt_amount, leverage=10, config=None, dry_run=False):
-    if config is None:
-        from config import get_config
-        config = get_config()
+ORDER_PATH = '/openApi/swap/v2/trade/order'
+log = get_logger('trade')
 
-    # Symbol fix: BTC/USDT → BTCUSDT
-    symbol = signal['symbol'].replace('/', '').replace('-', '').upper()
+# === SYMBOL SETTINGS CACHE ===
+# Last leverage / margin type BingX confirmed, keyed by (api_key, symbol)
+_symbol_settings = {}
 
-    direction = signal['direction']
-    entry = signal['entry']
-    targets = signal['targets']
-    stoploss = signal['stoploss']
+def refresh_symbol_settings(client=None, symbol=None):
+    """Forget cached settings so the next trade re-sends them (all, one account, or one symbol)."""
+    for key in list(_symbol_settings):
+        if client is not None and key[0] != client['api_key']:
+            continue
+        if symbol is not None and key[1] != symbol:
+            continue
+        del _symbol_settings[key]
 
-    if dry_run:
-        print(f"[DRY RUN] Would open {direction} {symbol} {leverage}x ${usdt_amount:.2f}")
-        return
+async def ensure_symbol_settings(client, symbol, leverage, margin_type='ISOLATED'):
+    """Set leverage and margin type only when they differ from the last confirmed values."""
+    key = (client['api_key'], symbol)
+    cached = _symbol_settings.setdefault(key, {})
+    calls = []
+    if cached.get('leverage') != leverage:
+        calls.append(('leverage', leverage, bingx_api_request('POST', '/openApi/swap/v2/trade/leverage', client['api_key'], client['secret_key'], data={
+            'symbol': symbol, 'side': 'BOTH', 'leverage': leverage
+        })))
+    if cached.get('margin_type') != margin_type:
+        calls.append(('margin_type', margin_type, bingx_api_request('POST', '/openApi/swap/v2/trade/marginType', client['api_key'], client['secret_key'], data={
+            'symbol': symbol, 'marginType': margin_type
+        })))
+    if not calls:
+        return True
 
-    qty = round((usdt_amount * leverage) / entry, 6)
+    results = await asyncio.gather(*(call for _, _, call in calls))
+    ok = True
+    for (field, value, _), resp in zip(calls, results):
+        if resp.get('code') == 0:
+            cached[field] = value
+        else:
+            log.warning("%s %s update failed: %s", symbol, field, resp.get('msg'))
+            ok = False
+    if not ok:
+        _symbol_settings.pop(key, None)
+    return ok
 
-    # Set leverage & isolated mode
-    await bingx_api_request('POST', '/openApi/swap/v2/trade/leverage', client['api_key'], client['secret_key'], data={
-        'symbol': symbol, 'side': 'BOTH', 'leverage': leverage
-    })
-    await bingx_api_request('POST', '/openApi/swap/v2/trade/marginType', client['api_key'], client['secret_key'], data={
-        'symbol': symbol, 'marginType': 'ISOLATED'
-    })
+async def place_order(client, name, payload):
+    """Send one order leg and return its result record."""
+    sent = time.perf_counter()
+    resp = await bingx_api_request('POST', ORDER_PATH, client['api_key'], client['secret_key'], data=payload)
+    acked = time.perf_counter()
+    record(f"leg.{name}", acked - sent)
+    ok = resp.get('code') == 0
+    order = (resp.get('data') or {}).get('order', {}) if ok else {}
+    if not ok:
+        log.error("%s %s FAILED: %s", payload['symbol'], name, resp.get('msg'))
+    return {
+        'leg': name,
+        'ok': ok,
+        'order_id': order.get('orderId'),
+        'payload': payload,
+        'response': resp,
+        'acked_at': acked,
+    }
 
-    # Entry order – NO positionSide (One-Way mode)
-    side = 'BUY' if direction == 'LONG' else 'SELL'
-    opposite = 'SELL' if direction == 'LONG' else 'BUY'
+def build_bracket(symbol, direction, qty, targets, stoploss, config):
+    """Return the (name, payload) list for the 4 TPs, trailing stop and stop loss.
 
-    entry_payload = {
-        'symbol': symbol,
-        'side': side,
-        'type': 'LIMIT',
-        'quantity': f"{qty:.6f}",
-        'price': str(entry),
-        'timeInForce': 'GTC',
-        'workingType': 'MARK_PRICE'
-    }
-    print(f"SENDING ENTRY ORDER: {entry_payload}")
-    entry_resp = await bingx_api_request('POST', '/openApi/swap/v2/trade/order', client['api_key'], client['secret_key'], data=entry_payload)
-    print(f"ENTRY RESPONSE: {entry_resp}")
+    `qty` is the step-quantized entry quantity (Decimal).
+    """
+    opposite = 'SELL' if direction == 'LONG' else 'BUY'
+    spec = get_contract(symbol)
+    # Without a spec, ignore rounding leftovers under 1% of the position
+    min_qty = spec['min_qty'] if spec else qty / 100
+    legs = []
 
     # 4 Take Profits
-    closed = 0.0
+    closed = Decimal(0)
+    percents = [config['tp1_close_percent'], config['tp2_close_percent'], config['tp3_close_percent'], config['tp4_close_percent']]
     for i, tp in enumerate(targets):
-        percent = [config['tp1_close_percent'], config['tp2_close_percent'], config['tp3_close_percent'], config['tp4_close_percent']][i]
-        tp_qty = qty * (percent / 100)
-        closed += percent
+        tp_qty = quantize_qty(symbol, qty * Decimal(str(percents[i])) / 100)
+        if tp_qty <= 0 or tp_qty < min_qty:
+            log.warning("%s TP%d skipped – %s below min qty %s", symbol, i + 1, tp_qty, min_qty)
+            continue
+        closed += tp_qty
 
-        tp_payload = {
+        legs.append((f"TP{i+1}", {
             'symbol': symbol,
             'side': opposite,
             'type': 'TAKE_PROFIT_MARKET',
-            'quantity': f"{tp_qty:.6f}",
-            'stopPrice': str(tp),
+            'quantity': f"{tp_qty:f}",
+            'stopPrice': f"{quantize_price(symbol, tp):f}",
             'workingType': 'MARK_PRICE',
             'reduceOnly': 'false'
-        }
-        await bingx_api_request('POST', '/openApi/swap/v2/trade/order', client['api_key'], client['secret_key'], data=tp_payload)
+        }))
 
-    # Trailing Stop on remaining
-    remaining_qty = qty * (100 - closed) / 100
-    if remaining_qty > 0:
-        trail_payload = {
+    # Trailing Stop on remaining (includes any step-rounding leftover)
+    remaining_qty = qty - closed
+    if remaining_qty > 0 and remaining_qty >= min_qty:
+        legs.append(("TRAILING", {
             'symbol': symbol,
             'side': opposite,
             'type': 'TRAILING_STOP_MARKET',
-            'quantity': f"{remaining_qty:.6f}",
+            'quantity': f"{remaining_qty:f}",
             'callbackRate': str(config['trailing_callback_rate']),
             'workingType': 'MARK_PRICE',
             'reduceOnly': 'false'
-        }
-        await bingx_api_request('POST', '/openApi/swap/v2/trade/order', client['api_key'], client['secret_key'], data=trail_payload)
-        print("TRAILING STOP PLACED")
+        }))
 
     # Stop Loss
-    sl_payload = {
+    legs.append(("SL", {
         'symbol': symbol,
         'side': opposite,
         'type': 'STOP_MARKET',
-        'quantity': f"{qty:.6f}",
-        'stopPrice': str(stoploss),
+        'quantity': f"{qty:f}",
+        'stopPrice': f"{quantize_price(symbol, stoploss):f}",
         'workingType': 'MARK_PRICE',
         'reduceOnly': 'false'
+    }))
+    return legs
+
+async def place_bracket(client, legs, mode='concurrent'):
+    """Place the protective legs. 'concurrent' sends them all at once, 'serial' one after another."""
+    if mode == 'serial':
+        return [await place_order(client, name, payload) for name, payload in legs]
+    return list(await asyncio.gather(*(place_order(client, name, payload) for name, payload in legs)))
+
+def capped_stop(direction, entry, stoploss, percent):
+    """The signal's stop, moved in to `percent` % from the entry when it lies further away
+    (0 = no cap). Placed instead of the signal's stop when cap_stop_loss is on."""
+    if not percent:
+        return stoploss
+    if direction == 'LONG':
+        return max(stoploss, entry * (1 - percent / 100))
+    return min(stoploss, entry * (1 + percent / 100))
+
+async def execute_trade(client, signal, usdt_amount, leverage=10, config=None, dry_run=False, journal=None):
+    if config is None:
+        from config import get_config
+        config = get_config()
+
+    # Symbol fix: BTC/USDT → BTCUSDT
+    symbol = signal['symbol'].replace('/', '').replace('-', '').upper()
+
+    direction = signal['direction']
+    entry = signal['entry']
+    targets = signal['targets']
+    stoploss = signal['stoploss']
+
+    # With a simulator installed (api.use_simulator) dry runs go through the full order path
+    if dry_run and get_simulator() is None:
+        log.info("[DRY RUN] Would open %s %s %sx $%.2f", direction, symbol, leverage, usdt_amount)
+        return
+
+    if not entry or entry <= 0:
+        log.warning("SKIPPED %s – invalid entry price %s", symbol, entry)
+        return
+
+    if config['cap_stop_loss']:
+        stoploss = capped_stop(direction, entry, stoploss, config['stop_loss_percent'])
+    if stoploss != signal['stoploss']:
+        log.info("%s stop %s capped to %s (stop_loss_percent %s%%)", symbol, signal['stoploss'],
+                 quantize_price(symbol, stoploss), config['stop_loss_percent'])
+
+    # Free when the market feed has a fresh price; skipped otherwise
+    problem = pre_trade_problem(signal, config, stoploss)
+    if problem:
+        log.warning("SKIPPED %s – %s", symbol, problem)
+        return
+
+    started = time.monotonic()
+    await ensure_contracts(client)
+    price = quantize_price(symbol, entry)
+    qty = quantize_qty(symbol, (usdt_amount * leverage) / entry)
+    problem = check_order(symbol, qty, price)
+    if problem:
+        log.warning("SKIPPED %s – %s", symbol, problem)
+        return
+
+    # Set leverage & isolated mode (skipped when already confirmed)
+    await ensure_symbol_settings(client, symbol, leverage)
+    record('trade.pre_entry', time.monotonic() - started)
+
+    # Entry order – NO positionSide (One-Way mode)
+    side = 'BUY' if direction == 'LONG' else 'SELL'
+
+    entry_payload = {
+        'symbol': symbol,
+        'side': side,
+        'type': 'LIMIT',
+        'quantity': f"{qty:f}",
+        'price': f"{price:f}",
+        'timeInForce': 'GTC',
+        'workingType': 'MARK_PRICE'
     }
-    await bingx_api_request('POST', '/openApi/swap/v2/trade/order', client['api_key'], client['secret_key'], data=sl_payload)
+    legs = build_bracket(symbol, direction, qty, targets, stoploss, config)
+    trade_id = None
+    if journal is not None:
+        # Entry and bracket are journaled before anything is sent (see journal.reconcile)
+        trade_id = journal.begin(client.get('name', 'main'), symbol, direction, [("ENTRY", entry_payload)] + legs)
+    log.debug("Sending entry order: %s", entry_payload)
+    entry_leg = await place_order(client, "ENTRY", entry_payload)
+    log.debug("Entry response: %s", entry_leg['response'])
+    if not entry_leg['ok']:
+        refresh_symbol_settings(client, symbol)
+    if trade_id:
+        journal.acks(trade_id, [entry_leg], state='bracket' if entry_leg['ok'] else 'closed')
+
+    outcome = {
+        'symbol': symbol,
+        'direction': direction,
+        'leverage': leverage,
+        'quantity': float(qty),
+        'entry': entry_leg,
+        'legs': [],
+        'protected': False,
+        'ok': False,
+        'elapsed': 0.0,
+        'received_at': signal.get('received_at'),
+        'trade_id': trade_id,
+    }
+
+    # Bracket only goes out once the entry is acknowledged
+    if entry_leg['ok']:
+        outcome['legs'] = await place_bracket(client, legs, config.get('bracket_mode', 'concurrent'))
+        if trade_id:
+            journal.acks(trade_id, outcome['legs'], state='placed' if all(leg['ok'] for leg in outcome['legs']) else None)
+        outcome['protected'] = any(leg['leg'] == 'SL' and leg['ok'] for leg in outcome['legs'])
+        outcome['ok'] = all(leg['ok'] for leg in outcome['legs'])
+        if any(leg['leg'] == 'TRAILING' and leg['ok'] for leg in outcome['legs']):
+            log.debug("%s trailing stop placed", symbol)
+    outcome['elapsed'] = time.monotonic() - started
+    record('trade.total', outcome['elapsed'])
 
-    print(f"REAL TRADE EXECUTED: {symbol} {direction} {leverage}x – ${usdt_amount:.2f}")
\ No newline at end of file
+    if outcome['ok']:
+        log.info("TRADE EXECUTED: %s %s %sx – $%.2f (%.2fs)", symbol, direction, leverage, usdt_amount, outcome['elapsed'],
+                 extra={'fields': {'symbol': symbol, 'direction': direction, 'leverage': leverage,
+                                   'usdt': usdt_amount, 'elapsed': outcome['elapsed']}})
+    else:
+        failed = [leg['leg'] for leg in [entry_leg] + outcome['legs'] if not leg['ok']]
+        log.error("TRADE INCOMPLETE: %s %s – failed legs: %s", symbol, direction, ', '.join(failed),
+                  extra={'fields': {'symbol': symbol, 'direction': direction, 'failed_legs': failed}})
+    return outcome